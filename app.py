@@ -1,89 +1,159 @@
-import streamlit as st
-import json
-import os
-import time
-from datetime import datetime
-import sys
-
-# Allow importing from src
-sys.path.append(os.path.abspath(os.path.dirname(__file__)))
-from src.orchestrator import Orchestrator
-
-st.set_page_config(
-    page_title="AI News Briefing",
-    page_icon="",
-    layout="wide"
-)
-
-DATA_FILE = "briefing_data.json"
-
-def load_data():
-    if not os.path.exists(DATA_FILE):
-        return None
-    try:
-        with open(DATA_FILE, 'r') as f:
-            return json.load(f)
-    except:
-        return None
-
-st.title("AI News Briefing")
-
-data = load_data()
-
-if not data:
-    st.info("Waiting for the Agent to generate the first briefing...")
-    st.text("Make sure 'src/orchestrator.py' is running.")
-    
-    if st.button("Refresh"):
-        st.rerun()
-else:
-    # Header
-    last_update = datetime.fromisoformat(data['timestamp'])
-    st.caption(f"Last updated: {last_update.strftime('%Y-%m-%d %H:%M:%S')}")
-    
-    # Layout with sidebar-like structure or just columns
-    main_col, side_col = st.columns([2, 1])
-    
-    with main_col:
-        briefing_type = data.get('briefing_type', 'Trending Narrative')
-        st.markdown(f"### {briefing_type}")
-        
-        # Main Briefing Card
-        with st.container(border=True):
-            st.markdown(data['briefing'])
-            
-        st.markdown(f"**Synthesized from {data.get('trend_size', '?')} sources**")
-        
-        # Sources for the briefing
-        with st.expander("View Briefing Sources"):
-            for source in data.get('sources', []):
-                st.markdown(f"- [{source.get('title', 'Link')}]({source.get('link', '#')}) - *{source.get('source', 'Unknown')}*")
-
-        if st.button("Refresh"):
-            st.rerun()
-
-    with side_col:
-        st.subheader("Controls")
-        if st.button("Trigger Agent Run"):
-            with st.spinner("Running agent pipeline (Polling -> Clustering -> Synthesis)..."):
-                try:
-                    orchestrator = Orchestrator()
-                    orchestrator.run_pipeline()
-                    st.success("Pipeline finished! Refreshing view...")
-                    time.sleep(1)
-                    st.rerun()
-                except Exception as e:
-                    st.error(f"Error running pipeline: {e}")
-
-        st.subheader("Raw Feed (Latest)")
-        st.caption("All polled articles in valid window")
-        
-        raw_feed = data.get('all_articles', [])
-        if not raw_feed:
-            st.info("No raw articles data available.")
-        
-        for art in raw_feed:
-            with st.container(border=True):
-                st.markdown(f"**[{art.get('title', 'Untitled')}]({art.get('link', '#')})**")
-                st.caption(f"{art.get('source', 'Unknown')} • {art.get('published', '')[:16]}")
-
+import streamlit as st
+import os
+import math
+from datetime import datetime
+import sys
+
+# Allow importing from src
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+from src.briefing_store import BriefingStore
+from src.job_runner import JobRunner
+
+st.set_page_config(
+    page_title="AI News Briefing",
+    page_icon="",
+    layout="wide"
+)
+
+# Articles per page of the raw feed
+FEED_PAGE_SIZE = 20
+# Seconds between status refreshes while a background run is in progress
+POLL_SECONDS = 1
+
+@st.cache_resource(on_release=lambda orchestrator: orchestrator.close())
+def get_orchestrator():
+    # One orchestrator per server process keeps HTTP sessions, model clients and caches warm.
+    # Imported on the first run only, rendering stored briefings doesn't need the agents.
+    # Its worker processes (if any) are shut down when the cache entry is released.
+    from src.orchestrator import Orchestrator
+    return Orchestrator()
+
+@st.cache_resource
+def get_briefing_store():
+    return BriefingStore()
+
+@st.cache_resource
+def get_job_runner():
+    # Shared by every session: one background run per server process
+    return JobRunner(get_orchestrator)
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def load_data(version):
+    # Cached per version (the newest run id), so reruns only re-read after a new run is saved
+    return get_briefing_store().latest_run()
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def load_feed_page(run_id, page):
+    # Saved runs never change, a page can be cached for good
+    return get_briefing_store().run_articles(run_id, offset=page * FEED_PAGE_SIZE, limit=FEED_PAGE_SIZE)
+
+def render_sources(sources):
+    for source in sources:
+        st.markdown(f"- [{source.get('title', 'Link')}]({source.get('link', '#')}) - *{source.get('source', 'Unknown')}*")
+
+@st.fragment(run_every=POLL_SECONDS)
+def job_status():
+    """Polls the background run, streaming its briefings, and reruns the page once it finishes."""
+    job = get_job_runner().job
+    status = job.snapshot()
+    if status['status'] != 'running':
+        st.rerun()
+    stage = status['stage'] or 'starting'
+    st.progress(status['progress'], text=f"Running agent pipeline: {stage} ({status['elapsed']:.0f}s)")
+    if status['texts']:
+        st.markdown("### Live Briefing")
+        for text in status['texts']:
+            with st.container(border=True):
+                st.markdown(text)
+
+def job_result():
+    """Reports the outcome of a run this session watched, once."""
+    job = get_job_runner().job
+    if job is None or not job.done or st.session_state.get('watching') != job.id:
+        return
+    del st.session_state['watching']
+    status = job.snapshot()
+    if status['status'] == 'busy':
+        st.warning("An agent run is already in progress (scheduler or another session), try again when it finishes.")
+    elif status['status'] == 'failed':
+        st.error(f"Error running pipeline: {status['error']}")
+    else:
+        st.success(f"Pipeline finished in {status['elapsed']:.0f}s ({status['outcome']}).")
+
+def run_controls():
+    st.subheader("Controls")
+    runner = get_job_runner()
+    running = runner.job is not None and not runner.job.done
+    if st.button("Trigger Agent Run", disabled=running):
+        # The run happens in a background thread, the page keeps rendering and polls it
+        st.session_state['watching'] = runner.start(force=True).id
+        running = True
+    elif running:
+        st.session_state['watching'] = runner.job.id
+    return running
+
+@st.fragment
+def raw_feed(run_id, total):
+    """One page of the run's articles, paging only reruns this fragment."""
+    pages = max(1, math.ceil(total / FEED_PAGE_SIZE))
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1, key=f"feed_page_{run_id}")
+    articles = load_feed_page(run_id, page - 1)
+    if not articles:
+        st.info("No raw articles data available.")
+    for art in articles:
+        st.markdown(f"**[{art.get('title', 'Untitled')}]({art.get('link', '#')})**  \n"
+                    f"{art.get('source', 'Unknown')} • {art.get('published', '')[:16]}")
+
+st.title("AI News Briefing")
+
+data = load_data(get_briefing_store().latest_run_id())
+
+# Layout with sidebar-like structure or just columns
+main_col, side_col = st.columns([2, 1])
+
+with side_col:
+    running = run_controls()
+
+with main_col:
+    if running:
+        job_status()
+    job_result()
+
+    if not data or not data['briefings']:
+        st.info("Waiting for the Agent to generate the first briefing...")
+        st.text("Make sure 'src/orchestrator.py' is running.")
+    else:
+        # Header
+        last_update = datetime.fromisoformat(data['timestamp']).astimezone()
+        st.caption(f"Last updated: {last_update.strftime('%Y-%m-%d %H:%M:%S')}")
+
+        top = data['briefings'][0]
+        briefing_type = top.get('briefing_type') or 'Trending Narrative'
+        st.markdown(f"### {briefing_type}")
+
+        # Main Briefing Card
+        with st.container(border=True):
+            st.markdown(top['briefing'])
+
+        st.markdown(f"**Synthesized from {top.get('trend_size', '?')} sources**")
+
+        # Sources for the briefing
+        with st.expander("View Briefing Sources"):
+            render_sources(top.get('sources', []))
+
+        # Further trends, when the agent briefs on more than the top cluster
+        for item in data['briefings'][1:]:
+            st.markdown(f"### {item.get('briefing_type') or 'Trending Narrative'}")
+            with st.container(border=True):
+                st.markdown(item['briefing'])
+            with st.expander(f"View Sources ({item.get('trend_size', '?')})"):
+                render_sources(item.get('sources', []))
+
+    if st.button("Refresh"):
+        st.rerun()
+
+with side_col:
+    if data:
+        st.subheader("Raw Feed (Latest)")
+        st.caption(f"{data['article_count']} polled articles in valid window")
+        raw_feed(data['id'], data['article_count'])
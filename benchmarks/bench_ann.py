@@ -0,0 +1,77 @@
+"""
+Benchmarks approximate (IVF) against exact neighbourhood search for trend detection.
+
+Reports, for synthetic clustered embeddings at each size:
+  - wall time of the exact (blocked) graph + DBSCAN path and of the ANN graph + DBSCAN path, and the speedup
+  - recall of eps-neighbour pairs found by the ANN index
+  - adjusted Rand index between the exact and approximate cluster labels
+
+Usage: python benchmarks/bench_ann.py --sizes 2000 10000 --dim 768
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from sklearn.cluster import DBSCAN
+from sklearn.metrics import adjusted_rand_score
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.ann_index import IVFIndex
+from src.similarity import to_unit_matrix, radius_neighbors_graph
+
+def make_embeddings(n, dim, clustered_fraction=0.3, seed=0):
+    """Clusters of 3-20 near-duplicate headlines on top of unrelated noise vectors."""
+    rng = np.random.default_rng(seed)
+    vectors = []
+    remaining = int(n * clustered_fraction)
+    while remaining > 0:
+        size = min(remaining, int(rng.integers(3, 21)))
+        center = rng.standard_normal(dim)
+        center /= np.linalg.norm(center)
+        vectors.append(center + 0.02 * rng.standard_normal((size, dim)))
+        remaining -= size
+    vectors.append(rng.standard_normal((n - int(n * clustered_fraction), dim)))
+    X = np.vstack(vectors).astype(np.float32)
+    return X[rng.permutation(n)]
+
+def run(n, dim, eps, min_samples, n_probe):
+    X = to_unit_matrix(make_embeddings(n, dim))
+
+    started = time.perf_counter()
+    exact_graph = radius_neighbors_graph(X, eps)
+    exact_labels = DBSCAN(eps=eps, min_samples=min_samples, metric='precomputed').fit(exact_graph).labels_
+    exact_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    graph = IVFIndex(n_probe=n_probe).fit(X).radius_neighbors_graph(eps)
+    ann_labels = DBSCAN(eps=eps, min_samples=min_samples, metric='precomputed').fit(graph).labels_
+    ann_time = time.perf_counter() - started
+
+    recall = graph.nnz / exact_graph.nnz if exact_graph.nnz else 1.0
+    return {
+        'n': n,
+        'exact_s': exact_time,
+        'ann_s': ann_time,
+        'speedup': exact_time / ann_time if ann_time else float('inf'),
+        'pair_recall': recall,
+        'ari': adjusted_rand_score(exact_labels, ann_labels),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 20000])
+    parser.add_argument('--dim', type=int, default=768)
+    parser.add_argument('--eps', type=float, default=0.25)
+    parser.add_argument('--min-samples', type=int, default=3)
+    parser.add_argument('--n-probe', type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{'n':>8} {'exact s':>9} {'ann s':>9} {'speedup':>8} {'recall':>7} {'ARI':>6}")
+    for n in args.sizes:
+        r = run(n, args.dim, args.eps, args.min_samples, args.n_probe)
+        print(f"{r['n']:>8} {r['exact_s']:>9.2f} {r['ann_s']:>9.2f} {r['speedup']:>7.1f}x {r['pair_recall']:>7.3f} {r['ari']:>6.3f}")
+
+if __name__ == "__main__":
+    main()
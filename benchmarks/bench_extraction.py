@@ -0,0 +1,70 @@
+"""
+Benchmarks the ScraperAgent text extractors over a corpus of saved HTML pages.
+
+For every extractor it reports throughput (MB of HTML per second) and how close its
+output is to the reference SoupExtractor output:
+  - exact: share of pages with identical output
+  - token F1: overlap of the word multisets, averaged over pages
+
+Usage: python benchmarks/bench_extraction.py [--corpus DIR] [--repeat N] [--max-chars N]
+"""
+import os
+import sys
+import glob
+import time
+import argparse
+from collections import Counter
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.extractors import EXTRACTORS, SoupExtractor
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), 'fixtures', 'html')
+
+def load_corpus(corpus_dir):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(corpus_dir, '*.htm*'))):
+        with open(path, 'rb') as f:
+            pages.append((os.path.basename(path), f.read().decode('utf-8', errors='replace')))
+    return pages
+
+def token_f1(candidate, reference):
+    cand, ref = Counter(candidate.split()), Counter(reference.split())
+    if not cand and not ref:
+        return 1.0
+    overlap = sum((cand & ref).values())
+    if not overlap:
+        return 0.0
+    precision = overlap / sum(cand.values())
+    recall = overlap / sum(ref.values())
+    return 2 * precision * recall / (precision + recall)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--max-chars', type=int, default=10000)
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus)
+    if not pages:
+        print(f"No .html files found in {args.corpus}")
+        return
+    total_mb = sum(len(html.encode('utf-8')) for _, html in pages) / 1e6
+    reference = {name: SoupExtractor().extract(html, args.max_chars) for name, html in pages}
+    print(f"{len(pages)} pages, {total_mb:.2f} MB, {args.repeat} repetitions\n")
+
+    print(f"{'extractor':<10} {'MB/s':>8} {'ms/page':>8} {'exact':>6} {'token F1':>9}")
+    for name, cls in EXTRACTORS.items():
+        extractor = cls()
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            outputs = {page: extractor.extract(html, args.max_chars) for page, html in pages}
+        elapsed = time.perf_counter() - started
+        exact = sum(outputs[p] == reference[p] for p, _ in pages) / len(pages)
+        f1 = sum(token_f1(outputs[p], reference[p]) for p, _ in pages) / len(pages)
+        print(f"{name:<10} {total_mb * args.repeat / elapsed:>8.1f} {elapsed * 1000 / (args.repeat * len(pages)):>8.2f} "
+              f"{exact:>6.0%} {f1:>9.3f}")
+
+if __name__ == "__main__":
+    main()
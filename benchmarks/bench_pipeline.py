@@ -0,0 +1,465 @@
+"""
+Offline, reproducible benchmarks of every pipeline stage and of the full run.
+
+Nothing touches the network or the Gemini APIs:
+  - feeds are generated from the recorded RSS / Atom fixtures in fixtures/feeds (their
+    headlines and summaries, in both formats) and served, like the HTML fixtures in
+    fixtures/html, by src.fake_backends.FakeHTTPAdapter mounted on the agents' sessions
+  - embeddings come from FakeEmbeddingBackend, briefings from FakeGenerativeModel, both
+    with configurable latency
+  - the corpus is seeded: 30% of the articles cover widely reported stories (3-20 articles
+    across feeds, half of them syndicated copies), so the store has near-duplicates to
+    collapse and the clustering stages find real trends
+  - the feeds are spread over FEED_HOSTS hosts, like a real feed list
+
+Stages: poll, poll_sharded (src.sharding.ShardedPoller on --shards processes, including their
+upserts into the article store), store, embed, cluster (DBSCAN), cluster_incremental, scrape,
+synthesize, pipeline (Orchestrator.run_pipeline) and pipelined (Orchestrator.run_pipelined).
+Every (stage, size) pair runs in a fresh subprocess so peak memory (max RSS) is its own.
+For each one it reports the median wall time over --repeat runs, throughput (items/s),
+p50/p95/p99 of the per-item latencies recorded by src.metrics, and peak RSS. The pipeline and
+pipelined stages must brief trends of the same sizes, the run fails if they don't.
+Results are written as JSON (with the commit and machine) to compare across commits:
+
+Usage: python benchmarks/bench_pipeline.py [--sizes 50 1000 50000] [--stages poll embed ...]
+       python benchmarks/bench_pipeline.py --compare benchmarks/results/OLD.json
+"""
+import os
+import re
+import sys
+import json
+import time
+import glob
+import random
+import shutil
+import tempfile
+import platform
+import argparse
+import statistics
+import subprocess
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from xml.sax.saxutils import escape
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+STAGES = ['poll', 'poll_sharded', 'store', 'embed', 'cluster', 'cluster_incremental', 'scrape', 'synthesize', 'pipeline', 'pipelined']
+ITEMS_PER_FEED = 50
+BASE_URL = "http://bench.local"
+FEED_HOSTS = 64
+
+# Per-item latency histogram (src.metrics) summarised for each stage
+STAGE_LATENCY = {
+    'poll': 'feed_fetch_seconds',
+    'poll_sharded': 'feed_fetch_seconds',
+    'embed': 'api_request_seconds{api="embedding"}',
+    'scrape': 'scrape_page_seconds',
+    'synthesize': 'api_request_seconds{api="generation"}',
+    'pipeline': 'api_request_seconds{api="generation"}',
+    'pipelined': 'api_request_seconds{api="generation"}',
+}
+
+# --- corpus ----------------------------------------------------------------------------
+
+def load_fixture_texts():
+    """(title, summary) pairs of every item in the recorded feeds."""
+    import feedparser
+    texts = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, 'feeds', '*.xml'))):
+        for entry in feedparser.parse(path).entries:
+            summary = re.sub(r'<[^>]+>', ' ', entry.get('summary', ''))
+            texts.append((entry.title, ' '.join(summary.split())))
+    return texts
+
+def load_pages():
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, 'html', '*.htm*'))):
+        with open(path, 'rb') as f:
+            pages.append(f.read())
+    return pages
+
+def make_articles(n, seed=0, clustered_fraction=0.3):
+    """
+    n article dicts, 30% of them about widely covered stories (3-20 articles per story, in
+    different feeds), the rest unique. Half the articles of a story are syndicated copies
+    (identical headline and summary) that the article store collapses, the others are
+    coverage by other outlets (same headline and lead, own wording) that the clustering
+    stages group into a trend. Deterministic for a given seed.
+    """
+    rng = random.Random(seed)
+    texts = load_fixture_texts()
+    now = datetime.now(timezone.utc)
+    n_feeds = max(1, -(-n // ITEMS_PER_FEED))
+    articles = []
+
+    def article(idx, title, summary):
+        return {
+            'id': f"{BASE_URL}/a/{idx}",
+            'title': title,
+            'link': f"{BASE_URL}/a/{idx}",
+            'summary': summary,
+            'published': (now - timedelta(minutes=rng.randint(1, 20 * 60))).isoformat(),
+            'feed': idx % n_feeds,
+        }
+
+    # Headlines start like a fixture headline and go on with random fixture words, so distinct
+    # stories are neither near-duplicates nor similar enough to be clustered together
+    vocab = sorted({word for title, summary in texts for word in f"{title} {summary}".split()})
+
+    def story_text(idx):
+        title = ' '.join(texts[idx % len(texts)][0].split()[:3])
+        return f"{title} {' '.join(rng.sample(vocab, 10))}", ' '.join(rng.sample(vocab, 20))
+
+    def coverage(title, summary):
+        """Another outlet's article on the story: same headline and lead, rest reworded."""
+        return title, ' '.join(summary.split()[:10] + rng.sample(vocab, 10))
+
+    clustered = int(n * clustered_fraction)
+    while len(articles) < clustered:
+        title, summary = story_text(len(articles))
+        size = min(clustered - len(articles), rng.randint(3, 20))
+        for copy in range(size):
+            text = (title, summary) if copy % 2 == 0 else coverage(title, summary)
+            articles.append(article(len(articles), *text))
+    while len(articles) < n:
+        articles.append(article(len(articles), *story_text(len(articles))))
+    rng.shuffle(articles)
+    # Spread over the feeds after shuffling so story copies land in different feeds
+    for idx, art in enumerate(articles):
+        art['feed'] = idx % n_feeds
+    return articles, n_feeds
+
+def feed_url(feed_idx):
+    return f"http://feeds{feed_idx % FEED_HOSTS}.bench.local/feeds/{feed_idx}"
+
+def render_feed(feed_idx, articles):
+    """Even feeds are RSS 2.0, odd feeds Atom, like the fixtures."""
+    if feed_idx % 2 == 0:
+        items = ''.join(
+            f"<item><title><![CDATA[{a['title']}]]></title><description><![CDATA[{a['summary']}]]></description>"
+            f"<link>{a['link']}</link><guid isPermaLink=\"true\">{a['id']}</guid>"
+            f"<pubDate>{format_datetime(datetime.fromisoformat(a['published']), usegmt=True)}</pubDate></item>"
+            for a in articles)
+        return (f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>Bench feed {feed_idx}</title>'
+                f'<link>{BASE_URL}/</link><description>Benchmark feed</description>{items}</channel></rss>').encode('utf-8')
+    entries = ''.join(
+        f"<entry><title type=\"html\">{escape(a['title'])}</title><link rel=\"alternate\" href=\"{a['link']}\"/>"
+        f"<id>{a['id']}</id><published>{a['published']}</published><updated>{a['published']}</updated>"
+        f"<summary type=\"html\">{escape(a['summary'])}</summary></entry>"
+        for a in articles)
+    return (f'<?xml version="1.0" encoding="utf-8"?><feed xmlns="http://www.w3.org/2005/Atom">'
+            f'<title>Bench feed {feed_idx}</title><id>{BASE_URL}/feeds/{feed_idx}</id>'
+            f'<updated>{datetime.now(timezone.utc).isoformat()}</updated>{entries}</feed>').encode('utf-8')
+
+def make_routes(articles, n_feeds):
+    """URL -> (body, content type) for every feed and article page."""
+    by_feed = [[] for _ in range(n_feeds)]
+    for art in articles:
+        by_feed[art['feed']].append(art)
+    routes = {feed_url(idx): (render_feed(idx, arts), 'application/rss+xml' if idx % 2 == 0 else 'application/atom+xml')
+              for idx, arts in enumerate(by_feed)}
+    pages = load_pages()
+    for idx, art in enumerate(articles):
+        routes[art['link']] = (pages[idx % len(pages)], 'text/html; charset=utf-8')
+    return routes
+
+# --- worker: one stage at one size, in its own process -----------------------------------
+
+def max_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KB on Linux, bytes on macOS
+    return rss / 1024 / 1024 if sys.platform == 'darwin' else rss / 1024
+
+class Bench:
+    """Builds the fakes for one stage and times it. Each repetition starts from a fresh state."""
+    def __init__(self, size, args, workdir):
+        from src.fake_backends import FakeHTTPAdapter, FakeEmbeddingBackend, FakeGenerativeModel
+        self.size = size
+        self.args = args
+        self.workdir = workdir
+        self.articles, self.n_feeds = make_articles(size, seed=args.seed)
+        self.routes = make_routes(self.articles, self.n_feeds)
+        self.feeds = [feed_url(idx) for idx in range(self.n_feeds)]
+        self.adapter = lambda latency: FakeHTTPAdapter(self.routes, latency=latency)
+        self.embedder = lambda: FakeEmbeddingBackend(dim=args.dim, latency=args.embed_latency)
+        self.llm = lambda: FakeGenerativeModel(latency=args.llm_latency)
+        # The agents import scikit-learn and scipy on first use. Load them up front so stage
+        # timings don't include one-off import costs (bench_startup.py measures those)
+        import sklearn.cluster, scipy.sparse
+        self._sharded = None
+        self.last_orchestrator = None
+
+    def fresh_dir(self, rep):
+        path = os.path.join(self.workdir, f"rep{rep}")
+        os.makedirs(path)
+        os.chdir(path)
+        return path
+
+    def synthesizer(self):
+        from src.synthesis_agent import SynthesisAgent
+        return SynthesisAgent(api_key='offline', model=self.llm(), use_cache=False,
+                              requests_per_minute=self.args.requests_per_minute)
+
+    def poller(self):
+        from src.rss_poller import RSSPoller
+        poller = RSSPoller(use_cache=False)
+        poller.session.mount('http://', self.adapter(self.args.http_latency))
+        return poller
+
+    def sharded_poller(self):
+        """
+        Kept across repetitions with its worker processes started (by an untimed warm-up poll
+        into a scratch store), so the timings don't include process startup.
+        """
+        from src.sharding import ShardedPoller
+        from src.fake_backends import FakeHTTPAdapter
+        if self._sharded is None:
+            # The workers only need the feeds
+            routes = {url: self.routes[url] for url in self.feeds}
+            self._sharded = ShardedPoller(self.args.shards, store_path=os.path.join(self.workdir, 'warmup.db'),
+                                          use_cache=False, adapter=FakeHTTPAdapter(routes, latency=self.args.http_latency))
+            self._sharded.poll(self.feeds, time_window_hours=24.0)
+        self._sharded.store_path = os.path.abspath('articles.db')
+        return self._sharded
+
+    def scraper(self):
+        from src.scraper_agent import ScraperAgent
+        scraper = ScraperAgent(use_cache=False, deadline=3600)
+        scraper.session.mount('http://', self.adapter(self.args.http_latency))
+        return scraper
+
+    def detector(self, mode='dbscan', warm=False):
+        from src.trend_detector import TrendDetector
+        from src.embedding_cache import EmbeddingCache
+        detector = TrendDetector(api_key='offline', cache=EmbeddingCache(), embedding_backend=self.embedder(),
+                                 mode=mode, neighbors=self.args.neighbors,
+                                 requests_per_minute=self.args.requests_per_minute)
+        if warm:
+            detector.vectorize_texts([detector.headline(a) for a in self.articles])
+        return detector
+
+    def orchestrator(self, cluster_mode):
+        from src.orchestrator import Orchestrator
+        orch = Orchestrator(cluster_mode=cluster_mode, top_k=self.args.top_k, synthesizer=self.synthesizer())
+        orch.detector = self.detector(cluster_mode)
+        orch.poller = self.poller()
+        orch.scraper = self.scraper()
+        with open('feeds.json', 'w') as f:
+            json.dump(self.feeds, f)
+        return orch
+
+    def trend_sizes(self):
+        """Sizes of the trends briefed by the last pipeline run (sequential and pipelined must agree)."""
+        run = self.last_orchestrator.briefings.latest_run()
+        return [item['trend_size'] for item in run['briefings']] if run else []
+
+    def setup(self, stage):
+        """Returns (callable timed, number of items it processes)."""
+        if stage == 'poll':
+            poller = self.poller()
+            return lambda: poller.fetch_feeds(self.feeds, time_window_hours=24.0), self.size
+        if stage == 'poll_sharded':
+            poller = self.sharded_poller()
+            return lambda: poller.poll(self.feeds, time_window_hours=24.0), self.size
+        if stage == 'store':
+            from src.article_store import ArticleStore
+            store = ArticleStore()
+            return lambda: store.upsert(self.articles), self.size
+        if stage == 'embed':
+            detector = self.detector()
+            headlines = [detector.headline(a) for a in self.articles]
+            return lambda: detector.vectorize_texts(headlines), self.size
+        if stage == 'cluster':
+            detector = self.detector(warm=True)
+            return lambda: detector.detect_clusters(self.articles), self.size
+        if stage == 'cluster_incremental':
+            detector = self.detector('incremental', warm=True)
+            cutoff = datetime.now(timezone.utc) - timedelta(hours=24)
+            return lambda: detector.update_clusters(self.articles, cutoff), self.size
+        if stage == 'scrape':
+            scraper = self.scraper()
+            urls = [a['link'] for a in self.articles[:self.args.max_pages]]
+            return lambda: scraper.scrape_urls(urls), len(urls)
+        if stage == 'synthesize':
+            from src.extractors import get_extractor
+            agent = self.synthesizer()
+            extractor = get_extractor('lxml')
+            texts = [extractor.extract(page) for page in load_pages()]
+            count = max(1, min(self.size // ITEMS_PER_FEED, 20))
+            # One briefing per 5-source cluster, each with its own sources
+            clusters = [{f"{BASE_URL}/s/{c}/{i}": texts[(c + i) % len(texts)] + f"\nCluster {c} source {i}."
+                         for i in range(5)} for c in range(count)]
+            return lambda: [agent.synthesize_briefing(c) for c in clusters], count
+        if stage in ('pipeline', 'pipelined'):
+            orch = self.last_orchestrator = self.orchestrator(self.args.cluster_mode)
+            run = orch.run_pipeline if stage == 'pipeline' else orch.run_pipelined
+            return lambda: run(force=True), self.size
+        raise ValueError(f"Unknown stage {stage}")
+
+def run_worker(stage, size, args):
+    import logging
+    from src.metrics import METRICS
+    logging.disable(logging.WARNING)
+    METRICS.keep_samples = True
+
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    cwd = os.getcwd()
+    try:
+        os.chdir(workdir)
+        bench = Bench(size, args, workdir)
+        setup_rss = max_rss_mb()
+        times = []
+        before = METRICS.snapshot()
+        for rep in range(args.repeat):
+            bench.fresh_dir(rep)
+            fn, items = bench.setup(stage)
+            started = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - started)
+        report = METRICS.report(since=before)
+        trend_sizes = bench.trend_sizes() if bench.last_orchestrator else None
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    wall = statistics.median(times)
+    latency = report['histograms'].get(STAGE_LATENCY.get(stage, ''), {})
+    return {
+        'stage': stage,
+        'size': size,
+        'items': items,
+        'repeat': args.repeat,
+        'wall_s': round(wall, 4),
+        'min_s': round(min(times), 4),
+        'items_per_s': round(items / wall, 1) if wall else None,
+        'latency_metric': STAGE_LATENCY.get(stage),
+        'p50_s': latency.get('p50'),
+        'p95_s': latency.get('p95'),
+        'p99_s': latency.get('p99'),
+        'peak_rss_mb': round(max_rss_mb(), 1) if resource else None,
+        'setup_rss_mb': round(setup_rss, 1) if resource else None,
+        'cache_hit_rates': report['cache_hit_rates'],
+        'trend_sizes': trend_sizes,
+    }
+
+# --- driver -----------------------------------------------------------------------------
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def worker_args(args):
+    """Options forwarded to the worker processes."""
+    return ['--repeat', str(args.repeat), '--seed', str(args.seed), '--dim', str(args.dim),
+            '--http-latency', str(args.http_latency), '--embed-latency', str(args.embed_latency),
+            '--llm-latency', str(args.llm_latency), '--max-pages', str(args.max_pages),
+            '--requests-per-minute', str(args.requests_per_minute), '--neighbors', args.neighbors,
+            '--cluster-mode', args.cluster_mode, '--top-k', str(args.top_k), '--shards', str(args.shards)]
+
+def check_trend_sizes(results):
+    """The pipeline and pipelined stages cluster the same corpus: returns the sizes where their trends differ."""
+    sizes = {}
+    for r in results:
+        if r.get('trend_sizes') is not None:
+            sizes.setdefault(r['size'], {})[r['stage']] = r['trend_sizes']
+    return {size: runs for size, runs in sizes.items() if len(runs) == 2 and runs['pipeline'] != runs['pipelined']}
+
+def print_table(results, baseline=None):
+    base = {(r['stage'], r['size']): r for r in (baseline or {}).get('results', [])}
+    header = f"{'stage':<20} {'size':>6} {'items':>6} {'wall s':>9} {'items/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'peak MB':>8}"
+    print(header + ("   vs base" if base else ""))
+    for r in results:
+        ms = lambda v: f"{v * 1000:>8.1f}" if v is not None else f"{'-':>8}"
+        line = (f"{r['stage']:<20} {r['size']:>6} {r['items']:>6} {r['wall_s']:>9.3f} {r['items_per_s'] or 0:>10.1f} "
+                f"{ms(r['p50_s'])} {ms(r['p95_s'])} {ms(r['p99_s'])} {r['peak_rss_mb'] or 0:>8.1f}")
+        old = base.get((r['stage'], r['size']))
+        if old and old['wall_s']:
+            line += f"   {r['wall_s'] / old['wall_s']:>6.2f}x time"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 1000, 50000])
+    parser.add_argument('--stages', nargs='+', default=STAGES, choices=STAGES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--dim', type=int, default=64, help="Fake embedding dimension")
+    parser.add_argument('--http-latency', type=float, default=0.0, help="Seconds added to every fake HTTP request")
+    parser.add_argument('--embed-latency', type=float, default=0.0, help="Seconds added to every embedding call")
+    parser.add_argument('--llm-latency', type=float, default=0.5, help="Seconds added to every generation call")
+    parser.add_argument('--requests-per-minute', type=float, default=1e9,
+                        help="API rate limit, unlimited by default so quotas don't hide code changes")
+    parser.add_argument('--max-pages', type=int, default=200, help="Pages scraped by the scrape stage")
+    parser.add_argument('--neighbors', default='exact', choices=['exact', 'ann'])
+    parser.add_argument('--cluster-mode', default='dbscan', choices=['dbscan', 'incremental'],
+                        help="Clustering used by the pipeline stages")
+    parser.add_argument('--top-k', type=int, default=3)
+    parser.add_argument('--shards', type=int, default=os.cpu_count() or 1, help="Worker processes of poll_sharded")
+    parser.add_argument('--timeout', type=float, default=900, help="Seconds allowed for one stage at one size")
+    parser.add_argument('--output', default=None, help="JSON results file (default: results/<commit>.json)")
+    parser.add_argument('--compare', default=None, help="Earlier results file to compare against")
+    parser.add_argument('--worker', nargs=2, metavar=('STAGE', 'SIZE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker[0], int(args.worker[1]), args)))
+        return
+
+    results = []
+    for size in args.sizes:
+        for stage in args.stages:
+            cmd = [sys.executable, os.path.abspath(__file__), '--worker', stage, str(size)] + worker_args(args)
+            try:
+                proc = subprocess.run(cmd, capture_output=True, text=True, timeout=args.timeout)
+            except subprocess.TimeoutExpired:
+                print(f"{stage} @ {size} timed out after {args.timeout:.0f}s", file=sys.stderr)
+                continue
+            if proc.returncode != 0:
+                print(f"{stage} @ {size} failed:\n{proc.stderr[-2000:]}", file=sys.stderr)
+                continue
+            results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+            print(f"  {stage} @ {size}: {results[-1]['wall_s']:.3f}s", file=sys.stderr)
+
+    commit = git_commit()
+    output = {
+        'commit': commit,
+        'date': datetime.now(timezone.utc).isoformat(),
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                    'cpus': os.cpu_count()},
+        'params': {k: v for k, v in vars(args).items() if k not in ('output', 'compare', 'worker')},
+        'results': results,
+    }
+    path = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(output, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"Comparing with {baseline['commit']} ({baseline['date']})")
+    print_table(results, baseline)
+    print(f"\nResults written to {path}")
+    mismatched = check_trend_sizes(results)
+    for size, runs in mismatched.items():
+        print(f"CHECK FAILED @ {size}: pipeline trend sizes {runs['pipeline']} != pipelined {runs['pipelined']}",
+              file=sys.stderr)
+    if mismatched:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Measures cold-start cost: how long fresh processes take to import the orchestrator, build
+one, start the scheduler CLI and render the app, and what each import costs.
+
+Every scenario runs --repeat times in a new interpreter (in a scratch directory, so the
+agents' caches and stores start empty) and reports the median wall time. The import
+breakdown comes from `python -X importtime` and lists the modules with the largest
+cumulative and self import time.
+
+Usage: python benchmarks/bench_startup.py [--repeat N] [--top N] [--module src.orchestrator]
+"""
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# name -> python arguments, run from a scratch directory with the repo on PYTHONPATH
+SCENARIOS = {
+    'import orchestrator': ['-c', 'import src.orchestrator'],
+    'build orchestrator': ['-c', 'from src.orchestrator import Orchestrator; Orchestrator()'],
+    'scheduler --help': [os.path.join(ROOT, 'src', 'scheduler.py'), '--help'],
+    'app first render': ['-c', 'from streamlit.testing.v1 import AppTest; '
+                               f'AppTest.from_file({os.path.join(ROOT, "app.py")!r}).run(timeout=60)'],
+}
+
+# Heavy third-party dependencies, reported as imported or not by the breakdown's module
+HEAVY_MODULES = ('numpy', 'requests', 'feedparser', 'lxml', 'bs4', 'scipy', 'sklearn', 'pandas', 'google.generativeai')
+
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+def run_python(args, cwd, extra_flags=()):
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, *extra_flags, *args], cwd=cwd, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} failed:\n{proc.stderr[-2000:]}")
+    return elapsed, proc.stderr
+
+def time_scenarios(repeat):
+    results = {}
+    for name, args in SCENARIOS.items():
+        times = []
+        for _ in range(repeat):
+            scratch = tempfile.mkdtemp(prefix="startup-")
+            try:
+                times.append(run_python(args, scratch)[0])
+            finally:
+                shutil.rmtree(scratch, ignore_errors=True)
+        results[name] = {'median_s': round(statistics.median(times), 4), 'min_s': round(min(times), 4)}
+    return results
+
+def import_breakdown(module):
+    """[(name, depth, self_us, cumulative_us)] from python -X importtime, in import order."""
+    scratch = tempfile.mkdtemp(prefix="startup-")
+    try:
+        _, stderr = run_python(['-c', f'import {module}'], scratch, extra_flags=('-X', 'importtime'))
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    rows = []
+    for line in stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, len(indent) // 2, int(self_us), int(cumulative_us)))
+    return rows
+
+def import_subtree(rows, module):
+    """Rows imported by module (importtime prints children before their parent), ending with module."""
+    end = next((idx for idx, row in enumerate(rows) if row[0] == module and row[1] == 0), None)
+    if end is None:
+        return []
+    start = end
+    while start > 0 and rows[start - 1][1] > 0:
+        start -= 1
+    return rows[start:end + 1]
+
+def heavy_imports(rows):
+    """{module: cumulative us, or None when it is not imported} for HEAVY_MODULES."""
+    cumulative = {}
+    for name, _, _, total in rows:
+        cumulative.setdefault(name, total)
+    return {name: cumulative.get(name) for name in HEAVY_MODULES}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help="Modules listed in the import breakdown")
+    parser.add_argument('--module', default='src.orchestrator', help="Module whose imports are broken down")
+    parser.add_argument('--output', default=None, help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    scenarios = time_scenarios(args.repeat)
+    print(f"{'scenario':<22} {'median ms':>10} {'min ms':>9}")
+    for name, result in scenarios.items():
+        print(f"{name:<22} {result['median_s'] * 1000:>10.0f} {result['min_s'] * 1000:>9.0f}")
+
+    rows = import_subtree(import_breakdown(args.module), args.module)
+    total = rows[-1][3] if rows else 0
+    print(f"\nimport {args.module}: {total / 1000:.0f} ms")
+    print(f"{'direct imports, by cumulative time':<48} {'cumulative ms':>14}")
+    for name, _, _, cumulative in sorted((r for r in rows if r[1] == 1), key=lambda r: -r[3])[:args.top]:
+        print(f"{name:<48} {cumulative / 1000:>14.1f}")
+    print(f"\n{'all imports, by self time':<48} {'self ms':>14}")
+    for name, _, self_us, _ in sorted(rows, key=lambda r: -r[2])[:args.top]:
+        print(f"{name:<48} {self_us / 1000:>14.1f}")
+
+    heavy = heavy_imports(rows)
+    print(f"\n{'heavy dependencies still imported':<48} {'cumulative ms':>14}")
+    for name, cumulative in heavy.items():
+        print(f"{name:<48} {'-' if cumulative is None else f'{cumulative / 1000:.1f}':>14}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'scenarios': scenarios, 'module': args.module, 'import_ms': total / 1000,
+                       'heavy_imports': heavy,
+                       'imports': [{'name': n, 'depth': d, 'self_us': s, 'cumulative_us': c} for n, d, s, c in rows]},
+                      f, indent=2)
+
+if __name__ == "__main__":
+    main()
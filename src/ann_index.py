@@ -0,0 +1,77 @@
+import logging
+import numpy as np
+
+from src.similarity import to_unit_matrix, neighbor_graph
+
+logger = logging.getLogger(__name__)
+
+class IVFIndex:
+    """
+    Inverted-file (IVF) index for approximate cosine neighbourhood search, CPU-only numpy.
+    Vectors are L2-normalized and bucketed by a spherical k-means coarse quantizer.
+    A neighbourhood query only compares against the n_probe buckets closest to the
+    query's own bucket, instead of against every vector.
+    """
+    def __init__(self, n_lists=None, n_probe=8, kmeans_iterations=10, seed=0):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.kmeans_iterations = kmeans_iterations
+        self.seed = seed
+        self.X = None
+        self.centroids = None
+        self.assignments = None
+
+    def fit(self, vectors):
+        X = to_unit_matrix(vectors)
+        n = len(X)
+        # sqrt(n) lists keeps both the quantizer and the probed buckets small
+        n_lists = min(n, self.n_lists or max(1, int(np.sqrt(n))))
+        rng = np.random.default_rng(self.seed)
+        sample = X[rng.choice(n, size=min(n, n_lists * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)]
+
+        for _ in range(self.kmeans_iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]
+            centroids = to_unit_matrix(sums)
+
+        self.X = X
+        self.centroids = centroids
+        self.assignments = self._assign(X)
+        return self
+
+    def _assign(self, X, block_size=8192):
+        labels = np.empty(len(X), dtype=np.int64)
+        for start in range(0, len(X), block_size):
+            labels[start:start + block_size] = np.argmax(X[start:start + block_size] @ self.centroids.T, axis=1)
+        return labels
+
+    def radius_neighbors_graph(self, eps):
+        """
+        Returns a sparse (n x n) CSR matrix holding the cosine distance of every pair found
+        within eps. Missing entries mean "not a neighbour", as DBSCAN(metric='precomputed') expects.
+        """
+        n_lists = len(self.centroids)
+        probe = min(self.n_probe, n_lists)
+        members = [np.flatnonzero(self.assignments == l) for l in range(n_lists)]
+        nearest_lists = np.argsort(-(self.centroids @ self.centroids.T), axis=1)[:, :probe]
+
+        rows, cols, dists = [], [], []
+        for l in range(n_lists):
+            queries = members[l]
+            if len(queries) == 0:
+                continue
+            candidates = np.concatenate([members[p] for p in nearest_lists[l]])
+            d = 1.0 - self.X[queries] @ self.X[candidates].T
+            q_idx, c_idx = np.nonzero(d <= eps)
+            rows.append(queries[q_idx])
+            cols.append(candidates[c_idx])
+            dists.append(d[q_idx, c_idx])
+
+        n = len(self.X)
+        graph = neighbor_graph(rows, cols, dists, n)
+        logger.info(f"ANN graph: {graph.nnz} neighbour pairs for {n} vectors ({n_lists} lists, probing {probe}).")
+        return graph
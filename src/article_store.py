@@ -0,0 +1,221 @@
+import os
+import sqlite3
+import threading
+import logging
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from src.shingling import simhash, simhash_bands, hamming
+from src.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_FILE = os.path.join(".cache", "articles.db")
+
+# Query parameters that only track the click, not the content
+_TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'mc_cid', 'mc_eid', 'ref', 'ref_src', 'cmpid', 'ocid')
+
+def canonical_url(url):
+    """
+    Normalizes an article URL so syndicated copies and reposts of the same page compare equal:
+    lower-case host without www., no scheme distinction, fragment, tracking parameters or trailing slash.
+    """
+    if not url:
+        return ''
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if not k.lower().startswith(_TRACKING_PARAMS))
+    return urlunsplit(('', host, parts.path.rstrip('/'), urlencode(query), '')).lstrip('/')
+
+def _signed64(value):
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+class ArticleStore:
+    """
+    Persistent SQLite store of polled articles keyed on the feed entry id (or link).
+    Lets the orchestrator tell which articles are new since the previous run and
+    keeps the sliding time window without re-building it from scratch.
+
+    Near-duplicates are collapsed on insert: an article whose canonical URL, or the SimHash of
+    its title and summary (within SIMHASH_DISTANCE bits), matches a stored article is kept as a
+    duplicate_of that representative, which counts it in source_count. Only representatives
+    are returned by upsert() and recent(), so copies are neither embedded nor counted twice.
+
+    Representatives stay pending until a run that saw them saved its briefings
+    (mark_briefed), so a run that fails after polling does not hide its articles from the next.
+    """
+    COLUMNS = ('id', 'title', 'link', 'summary', 'published', 'source', 'source_count')
+    SIMHASH_BANDS = 4
+    SIMHASH_DISTANCE = SIMHASH_BANDS - 1
+    BAND_COLUMNS = tuple(f'band{band}' for band in range(SIMHASH_BANDS))
+
+    def __init__(self, path=DEFAULT_DB_FILE):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS articles (
+                id TEXT PRIMARY KEY,
+                title TEXT,
+                link TEXT,
+                summary TEXT,
+                published TEXT,
+                source TEXT,
+                first_seen TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        # Dedup columns, added to stores created before near-duplicate collapsing
+        existing = {row['name'] for row in self.conn.execute("PRAGMA table_info(articles)")}
+        columns = [('canonical_url', 'TEXT'), ('simhash', 'INTEGER'), ('duplicate_of', 'TEXT'),
+                   ('source_count', 'INTEGER NOT NULL DEFAULT 1'), ('briefed', 'INTEGER NOT NULL DEFAULT 0')]
+        columns += [(name, 'INTEGER') for name in self.BAND_COLUMNS]
+        for name, kind in columns:
+            if name not in existing:
+                self.conn.execute(f"ALTER TABLE articles ADD COLUMN {name} {kind}")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_articles_published ON articles(published)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_articles_canonical_url ON articles(canonical_url)")
+        for name in self.BAND_COLUMNS:
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_articles_{name} ON articles({name})")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_articles_pending ON articles(briefed) "
+                          "WHERE briefed = 0 AND duplicate_of IS NULL")
+        self.conn.commit()
+
+    @staticmethod
+    def article_key(article):
+        return article.get('id') or article.get('link', '')
+
+    def _representative(self, url, fingerprint, bands):
+        """Id of the stored representative this article duplicates, or None."""
+        if url:
+            row = self.conn.execute(
+                "SELECT id FROM articles WHERE canonical_url = ? AND duplicate_of IS NULL LIMIT 1", (url,)).fetchone()
+            if row:
+                return row[0]
+        if not fingerprint:
+            return None
+        # Duplicates have no bands, so only representatives are candidates
+        where = ' OR '.join(f"{name} = ?" for name in self.BAND_COLUMNS)
+        for rep_id, other in self.conn.execute(f"SELECT id, simhash FROM articles WHERE {where}", bands):
+            if hamming(fingerprint, other % (1 << 64)) <= self.SIMHASH_DISTANCE:
+                return rep_id
+        return None
+
+    def _fingerprint(self, art):
+        """(canonical URL, SimHash, SimHash bands) of an article."""
+        fingerprint = simhash(f"{art.get('title', '')} {art.get('summary', '')}")
+        return canonical_url(art.get('link', '')), fingerprint, simhash_bands(fingerprint, self.SIMHASH_BANDS)
+
+    def _fingerprint_unseen(self, articles, batch=500):
+        """key -> _fingerprint() of the articles not in the store yet, computed without holding the write lock."""
+        keys = list({key for key in map(self.article_key, articles) if key})
+        known = set()
+        with self._lock:
+            for start in range(0, len(keys), batch):
+                chunk = keys[start:start + batch]
+                known.update(row[0] for row in self.conn.execute(
+                    f"SELECT id FROM articles WHERE id IN ({', '.join('?' * len(chunk))})", chunk))
+        fingerprints = {}
+        for art in articles:
+            key = self.article_key(art)
+            if key and key not in known and key not in fingerprints:
+                fingerprints[key] = self._fingerprint(art)
+        return fingerprints
+
+    def upsert(self, articles):
+        """
+        Inserts unseen articles and refreshes the metadata of known ones.
+        Returns the list of articles that were not in the store before, in input order,
+        without the ones collapsed into an earlier article as near-duplicates.
+        """
+        new_articles = []
+        collapsed = 0
+        # Hashing is the slow part, done before the write lock so concurrent writers only
+        # take turns on the lookups and inserts
+        fingerprints = self._fingerprint_unseen(articles)
+        with self._lock, self.conn:
+            # Take the write lock up front: the store may be shared by several processes (see
+            # src/sharding.py), and the duplicate lookups must see the rows of earlier writers
+            self.conn.execute("BEGIN IMMEDIATE")
+            for art in articles:
+                key = self.article_key(art)
+                if not key:
+                    continue
+                row = (key, art.get('title', ''), art.get('link', ''), art.get('summary', ''),
+                       art.get('published', ''), art.get('source', ''))
+                if self.conn.execute("SELECT 1 FROM articles WHERE id = ?", (key,)).fetchone():
+                    self.conn.execute(
+                        "UPDATE articles SET title = ?, link = ?, summary = ?, published = ?, source = ? WHERE id = ?",
+                        row[1:] + row[:1])
+                    continue
+                # Missing if the article was known before the lock and expired since
+                url, fingerprint, bands = fingerprints.get(key) or self._fingerprint(art)
+                rep_id = self._representative(url, fingerprint, bands)
+                if rep_id is not None:
+                    bands = [None] * len(bands)
+                self.conn.execute(
+                    "INSERT INTO articles (id, title, link, summary, published, source, canonical_url, simhash, "
+                    f"duplicate_of, {', '.join(self.BAND_COLUMNS)}) VALUES ({', '.join('?' * (9 + len(bands)))})",
+                    row + (url, _signed64(fingerprint), rep_id) + tuple(bands))
+                if rep_id is None:
+                    new_articles.append(dict(art, source_count=1))
+                else:
+                    self.conn.execute("UPDATE articles SET source_count = source_count + 1 WHERE id = ?", (rep_id,))
+                    collapsed += 1
+        METRICS.inc('articles_collapsed', collapsed)
+        logger.info(f"Article store: {len(new_articles)} new of {len(articles)} polled articles "
+                    f"({collapsed} near-duplicates collapsed).")
+        return new_articles
+
+    def expire(self, cutoff_time):
+        """
+        Deletes articles published before cutoff_time (timezone-aware datetime), and the
+        near-duplicates of the expired representatives with them. Returns the count.
+        """
+        cutoff = cutoff_time.isoformat()
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                "DELETE FROM articles WHERE published <= ? OR duplicate_of IN "
+                "(SELECT id FROM articles WHERE published <= ? AND duplicate_of IS NULL)", (cutoff, cutoff))
+        if cursor.rowcount:
+            logger.info(f"Article store: expired {cursor.rowcount} articles.")
+        return cursor.rowcount
+
+    def pending(self):
+        """Number of representatives not seen by a successful run yet."""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM articles WHERE briefed = 0 AND duplicate_of IS NULL").fetchone()[0]
+
+    def mark_briefed(self, articles):
+        """Marks the articles a successful run briefed on (its whole window) as no longer pending."""
+        with self._lock, self.conn:
+            self.conn.executemany("UPDATE articles SET briefed = 1 WHERE id = ? AND briefed = 0",
+                                  [(key,) for key in map(self.article_key, articles) if key])
+
+    def recent(self, cutoff_time, limit=None):
+        """Returns the representative articles published after cutoff_time, newest first."""
+        query = (f"SELECT {', '.join(self.COLUMNS)} FROM articles WHERE published > ? AND duplicate_of IS NULL "
+                 "ORDER BY published DESC")
+        params = [cutoff_time.isoformat()]
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,230 @@
+import os
+import json
+import sqlite3
+import threading
+import logging
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_FILE = "briefings.db"
+
+class BriefingStore:
+    """
+    Append-only SQLite history of the generated briefings.
+    Every run saves one row in runs, its briefings, and the article feed it saw. Articles are
+    stored once, never updated, and referenced by ID from briefing_sources and run_articles,
+    and each run is written in a single transaction. Timestamps are stored in UTC. Reads go
+    through indexes (latest run, time range, source), so they cost the same however long the
+    history grows.
+    """
+    ARTICLE_COLUMNS = ('id', 'title', 'link', 'summary', 'published', 'source')
+
+    def __init__(self, path=DEFAULT_DB_FILE):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at TEXT NOT NULL,
+                article_count INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_runs_created_at ON runs(created_at);
+
+            CREATE TABLE IF NOT EXISTS articles (
+                rowid INTEGER PRIMARY KEY,
+                id TEXT UNIQUE NOT NULL,
+                title TEXT,
+                link TEXT,
+                summary TEXT,
+                published TEXT,
+                source TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_articles_source ON articles(source);
+
+            CREATE TABLE IF NOT EXISTS briefings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_id INTEGER NOT NULL REFERENCES runs(id),
+                position INTEGER NOT NULL,
+                cluster_id TEXT,
+                briefing_type TEXT,
+                briefing TEXT,
+                trend_size INTEGER,
+                created_at TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_briefings_run ON briefings(run_id, position);
+            CREATE INDEX IF NOT EXISTS idx_briefings_created_at ON briefings(created_at);
+
+            CREATE TABLE IF NOT EXISTS briefing_sources (
+                briefing_id INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                article INTEGER NOT NULL,
+                PRIMARY KEY (briefing_id, position)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_briefing_sources_article ON briefing_sources(article);
+
+            CREATE TABLE IF NOT EXISTS run_articles (
+                run_id INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                article INTEGER NOT NULL,
+                PRIMARY KEY (run_id, position)
+            ) WITHOUT ROWID;
+        """)
+        self.conn.commit()
+
+    @staticmethod
+    def article_key(article):
+        return article.get('id') or article.get('link', '')
+
+    def _article_ref(self, article):
+        """
+        Inserts one article if it is not stored yet and returns its row id (call inside a transaction).
+        A stored article is left as it is: earlier runs reference it, the history must not change.
+        """
+        key = self.article_key(article)
+        row = (key,) + tuple(article.get(col, '') for col in self.ARTICLE_COLUMNS[1:])
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO articles (id, title, link, summary, published, source) "
+            "VALUES (?, ?, ?, ?, ?, ?)", row)
+        if cursor.rowcount == 1:
+            return cursor.lastrowid
+        return self.conn.execute("SELECT rowid FROM articles WHERE id = ?", (key,)).fetchone()[0]
+
+    def save(self, briefings, articles, timestamp=None):
+        """
+        Appends one run: its briefings (with their source articles) and the article feed,
+        newest first. Either everything is written or nothing is. Returns the run id.
+        """
+        created_at = (timestamp or datetime.now(timezone.utc)).astimezone(timezone.utc).isoformat()
+        with self._lock, self.conn:
+            refs = {}
+
+            def ref(article):
+                key = self.article_key(article)
+                if key not in refs:
+                    refs[key] = self._article_ref(article)
+                return refs[key]
+
+            run_id = self.conn.execute("INSERT INTO runs (created_at, article_count) VALUES (?, ?)",
+                                       (created_at, len(articles))).lastrowid
+            self.conn.executemany("INSERT INTO run_articles (run_id, position, article) VALUES (?, ?, ?)",
+                                  [(run_id, pos, ref(art)) for pos, art in enumerate(articles) if self.article_key(art)])
+            for pos, item in enumerate(briefings):
+                # The snapshot briefing has no cluster, its cluster_id is stored as NULL
+                cluster_id = item.get('cluster_id')
+                briefing_id = self.conn.execute(
+                    "INSERT INTO briefings (run_id, position, cluster_id, briefing_type, briefing, trend_size, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (run_id, pos, None if cluster_id is None else str(cluster_id), item.get('briefing_type', ''),
+                     item.get('briefing', ''), item.get('trend_size', 0), created_at)).lastrowid
+                self.conn.executemany(
+                    "INSERT INTO briefing_sources (briefing_id, position, article) VALUES (?, ?, ?)",
+                    [(briefing_id, idx, ref(art)) for idx, art in enumerate(item.get('sources', []))
+                     if self.article_key(art)])
+        logger.info(f"Briefing store: saved run {run_id} ({len(briefings)} briefing(s), {len(refs)} articles).")
+        return run_id
+
+    def _briefings(self, rows):
+        """Briefing dicts, with their sources, for briefing rows."""
+        result = []
+        for row in rows:
+            sources = self.conn.execute(
+                f"SELECT {', '.join('a.' + col for col in self.ARTICLE_COLUMNS)} FROM briefing_sources s "
+                "JOIN articles a ON a.rowid = s.article WHERE s.briefing_id = ? ORDER BY s.position",
+                (row['id'],)).fetchall()
+            result.append({
+                'id': row['id'],
+                'run_id': row['run_id'],
+                'created_at': row['created_at'],
+                'cluster_id': row['cluster_id'],
+                'briefing_type': row['briefing_type'],
+                'briefing': row['briefing'],
+                'trend_size': row['trend_size'],
+                'sources': [dict(source) for source in sources],
+            })
+        return result
+
+    def latest_run(self):
+        """The newest run as {'id', 'timestamp', 'article_count', 'briefings'}, or None."""
+        with self._lock:
+            run = self.conn.execute("SELECT id, created_at, article_count FROM runs ORDER BY id DESC LIMIT 1").fetchone()
+            if run is None:
+                return None
+            rows = self.conn.execute("SELECT * FROM briefings WHERE run_id = ? ORDER BY position", (run['id'],)).fetchall()
+            return {
+                'id': run['id'],
+                'timestamp': run['created_at'],
+                'article_count': run['article_count'],
+                'briefings': self._briefings(rows),
+            }
+
+    def latest_run_id(self):
+        """Id of the newest run (0 when empty). It changes with every save, use it as a cache version."""
+        with self._lock:
+            return self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM runs").fetchone()[0]
+
+    def has_runs(self):
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM runs LIMIT 1").fetchone() is not None
+
+    def run_articles(self, run_id=None, offset=0, limit=50):
+        """One page of the article feed saved with a run (default: the newest run), newest first."""
+        with self._lock:
+            if run_id is None:
+                row = self.conn.execute("SELECT MAX(id) FROM runs").fetchone()
+                run_id = row[0]
+            rows = self.conn.execute(
+                f"SELECT {', '.join('a.' + col for col in self.ARTICLE_COLUMNS)} FROM run_articles r "
+                "JOIN articles a ON a.rowid = r.article WHERE r.run_id = ? ORDER BY r.position LIMIT ? OFFSET ?",
+                (run_id, -1 if limit is None else limit, offset)).fetchall()
+        return [dict(row) for row in rows]
+
+    def briefings_between(self, start, end=None, limit=100):
+        """Briefings created in [start, end) (timezone-aware datetimes, any zone), newest first."""
+        end = end or datetime.now(timezone.utc)
+        # created_at is compared as text, the bounds must be UTC like the stored timestamps
+        start = start.astimezone(timezone.utc).isoformat()
+        end = end.astimezone(timezone.utc).isoformat()
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT * FROM briefings WHERE created_at >= ? AND created_at < ? "
+                "ORDER BY created_at DESC, position LIMIT ?",
+                (start, end, limit)).fetchall()
+            return self._briefings(rows)
+
+    def briefings_by_source(self, source, limit=100):
+        """Briefings that cite at least one article from the given feed source, newest first."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT * FROM briefings WHERE id IN ("
+                "  SELECT s.briefing_id FROM articles a JOIN briefing_sources s ON s.article = a.rowid"
+                "  WHERE a.source = ?"
+                ") ORDER BY id DESC LIMIT ?", (source, limit)).fetchall()
+            return self._briefings(rows)
+
+    def import_json(self, path):
+        """One-off import of a legacy briefing_data.json as a run. Returns the run id, or None."""
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not import {path}: {e}")
+            return None
+        briefings = data.get('briefings') or [{
+            'briefing_type': data.get('briefing_type', ''),
+            'briefing': data.get('briefing', ''),
+            'sources': data.get('sources', []),
+            'trend_size': data.get('trend_size', 0),
+        }]
+        timestamp = datetime.fromisoformat(data['timestamp']).astimezone(timezone.utc) if data.get('timestamp') else None
+        return self.save(briefings, data.get('all_articles', []), timestamp=timestamp)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
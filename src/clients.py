@@ -0,0 +1,50 @@
+"""
+Shared registry of configured API clients.
+The .env file is loaded once, and the Gemini SDK (slow to import) is imported and configured
+the first time a client is needed rather than when the agents are created, so processes that
+only read stored data never pay for it. Every agent shares the same configured clients.
+"""
+import os
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.RLock()
+_env_loaded = False
+_configured_key = None
+_models = {}
+
+def load_env():
+    """Loads .env into the environment, once per process."""
+    global _env_loaded
+    with _lock:
+        if not _env_loaded:
+            from dotenv import load_dotenv
+            load_dotenv()
+            _env_loaded = True
+
+def api_key(explicit=None):
+    """explicit if given, else GEMINI_API_KEY from the environment (or .env)."""
+    if explicit:
+        return explicit
+    load_env()
+    return os.getenv("GEMINI_API_KEY")
+
+def genai(key=None):
+    """The google.generativeai module, configured with key (default: GEMINI_API_KEY)."""
+    global _configured_key
+    key = api_key(key)
+    with _lock:
+        import google.generativeai as sdk
+        if key and key != _configured_key:
+            sdk.configure(api_key=key)
+            _configured_key = key
+        return sdk
+
+def generative_model(name, key=None):
+    """Shared GenerativeModel for name, created on first use."""
+    with _lock:
+        if name not in _models:
+            _models[name] = genai(key).GenerativeModel(name)
+        return _models[name]
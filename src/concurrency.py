@@ -0,0 +1,54 @@
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+
+class HostLimiter:
+    """
+    Caps the number of in-flight requests to any single host.
+    Shared between worker threads so one slow publisher cannot hog the pool.
+    """
+    def __init__(self, per_host_limit=2):
+        self.per_host_limit = per_host_limit
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    def _semaphore(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._semaphores[host]
+
+    @contextmanager
+    def limit(self, url):
+        """Blocks until a slot for the url's host is free."""
+        semaphore = self._semaphore(urlparse(url).netloc.lower())
+        with semaphore:
+            yield
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+    rate is the number of tokens added per second, capacity the maximum burst size.
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Blocks until the requested number of tokens is available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
@@ -0,0 +1,86 @@
+import time
+import random
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from src.concurrency import TokenBucket
+from src.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingBatcher:
+    """
+    Splits texts into fixed-size chunks and embeds them concurrently.
+    Requests go through a shared token bucket, failed chunks are retried with exponential
+    backoff and the results are reassembled in input order.
+    embed_fn takes a list of texts and returns one vector per text, raising on failure.
+    """
+    def __init__(self, embed_fn, batch_size=100, max_workers=4, requests_per_minute=150,
+                 max_retries=4, backoff_seconds=1.0):
+        self.embed_fn = embed_fn
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.rate_limiter = TokenBucket(requests_per_minute / 60.0, capacity=max_workers)
+        self.last_stats = {}
+
+    def embed(self, texts):
+        """
+        Returns a list aligned with texts. Texts whose chunk still failed after all
+        retries get None instead of a vector.
+        """
+        if not texts:
+            return []
+        started = time.monotonic()
+        chunks = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+
+        if len(chunks) == 1 or self.max_workers <= 1:
+            results = [self._embed_chunk(idx, chunk) for idx, chunk in enumerate(chunks)]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks)), thread_name_prefix="embed") as executor:
+                results = list(executor.map(self._embed_chunk, range(len(chunks)), chunks))
+
+        vectors = []
+        failed = 0
+        for chunk, chunk_vectors in zip(chunks, results):
+            if chunk_vectors is None:
+                failed += len(chunk)
+                vectors.extend([None] * len(chunk))
+            else:
+                vectors.extend(chunk_vectors)
+
+        elapsed = time.monotonic() - started
+        self.last_stats = {
+            'texts': len(texts),
+            'chunks': len(chunks),
+            'failed': failed,
+            'seconds': elapsed,
+            'texts_per_second': len(texts) / elapsed if elapsed > 0 else float('inf'),
+        }
+        logger.info(f"Embedded {len(texts) - failed}/{len(texts)} texts in {len(chunks)} chunks, "
+                    f"{elapsed:.2f}s ({self.last_stats['texts_per_second']:.1f} texts/s).")
+        if failed:
+            logger.error(f"{failed} texts could not be embedded after {self.max_retries} retries.")
+        return vectors
+
+    def _embed_chunk(self, idx, chunk):
+        """Embeds one chunk with retries. Returns None if every attempt failed."""
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                with METRICS.timer('api_request', api='embedding'):
+                    vectors = self.embed_fn(chunk)
+                if len(vectors) != len(chunk):
+                    raise ValueError(f"Expected {len(chunk)} embeddings, got {len(vectors)}")
+                METRICS.inc('api_calls', api='embedding', result='ok')
+                METRICS.inc('embedded_texts', len(chunk))
+                return vectors
+            except Exception as e:
+                METRICS.inc('api_calls', api='embedding', result='error')
+                if attempt == self.max_retries:
+                    logger.error(f"Embedding chunk {idx} failed: {e}")
+                    return None
+                delay = self.backoff_seconds * (2 ** attempt) * random.uniform(0.5, 1.5)
+                logger.warning(f"Embedding chunk {idx} failed ({e}), retrying in {delay:.1f}s...")
+                time.sleep(delay)
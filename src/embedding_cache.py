@@ -0,0 +1,140 @@
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(".cache", "embeddings")
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed embedding cache.
+    Vectors are stored as float32 rows of a memory-mapped file, the key -> row index and
+    least-recently-used bookkeeping live in a small SQLite database next to it.
+    The cache holds at most max_bytes of vectors, older entries are evicted first.
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self.vectors_path = os.path.join(cache_dir, "vectors.f32")
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(cache_dir, "index.db"), check_same_thread=False, timeout=30)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, slot INTEGER UNIQUE, last_used REAL)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries(last_used)")
+        self.conn.commit()
+        self.dim = self._meta('dim')
+        self.capacity = self._meta('capacity')
+        self._vectors = None
+        if self.dim and os.path.exists(self.vectors_path):
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r+', shape=(self.capacity, self.dim))
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(text, model, task_type):
+        """Content address of an embedding: hash of model, task type and text."""
+        return hashlib.sha256(f"{model}\x00{task_type}\x00{text}".encode('utf-8')).hexdigest()
+
+    def _meta(self, name):
+        row = self.conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _allocate(self, dim):
+        """Creates the vector file for the given dimensionality, dropping any existing entries."""
+        if self.dim is not None:
+            logger.warning(f"Embedding dimension changed from {self.dim} to {dim}, resetting cache.")
+        self.dim = dim
+        self.capacity = max(1, self.max_bytes // (dim * 4))
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='w+', shape=(self.capacity, dim))
+        with self.conn:
+            self.conn.execute("DELETE FROM entries")
+            self.conn.executemany("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                                  [('dim', dim), ('capacity', self.capacity)])
+
+    def get_many(self, keys):
+        """Returns {key: float32 vector} for the keys present in the cache."""
+        if self._vectors is None or not keys:
+            self.misses += len(keys)
+            return {}
+        with self._lock:
+            slots = self._lookup_slots(keys)
+            found = {key: np.array(self._vectors[slot]) for key, slot in slots.items()}
+            if found:
+                now = time.time()
+                with self.conn:
+                    self.conn.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+        self.hits += sum(1 for k in keys if k in found)
+        self.misses += sum(1 for k in keys if k not in found)
+        return found
+
+    def _lookup_slots(self, keys):
+        """Returns {key: slot} for cached keys. SQLite limits bound parameters, so keys are queried in chunks."""
+        slots = {}
+        unique_keys = list(dict.fromkeys(keys))
+        for i in range(0, len(unique_keys), 500):
+            chunk = unique_keys[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            slots.update(self.conn.execute(f"SELECT key, slot FROM entries WHERE key IN ({placeholders})", chunk).fetchall())
+        return slots
+
+    def put_many(self, items):
+        """Stores {key: vector}. Evicts least recently used entries when the cache is full."""
+        if not items:
+            return
+        items = {k: np.asarray(v, dtype=np.float32) for k, v in items.items()}
+        dim = len(next(iter(items.values())))
+        with self._lock:
+            if self._vectors is None or dim != self.dim:
+                self._allocate(dim)
+            # Keys that are already cached keep their slot
+            existing = self._lookup_slots(list(items))
+            now = time.time()
+            # Touch them first so eviction below cannot pick them
+            with self.conn:
+                self.conn.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(now, k) for k in existing])
+            new_keys = [k for k in items if k not in existing][:self.capacity - len(existing)]
+            slots = self._free_slots(len(new_keys))
+            assignments = dict(existing)
+            assignments.update(zip(new_keys, slots))
+            for key, slot in assignments.items():
+                self._vectors[slot] = items[key]
+            self._vectors.flush()
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                                      [(k, s, now) for k, s in assignments.items()])
+
+    def _free_slots(self, n):
+        """Returns n unused slot indices, evicting the least recently used entries if needed."""
+        if n == 0:
+            return []
+        used = self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        evict = max(0, used + n - self.capacity)
+        if evict:
+            victims = self.conn.execute("SELECT key, slot FROM entries ORDER BY last_used LIMIT ?", (evict,)).fetchall()
+            with self.conn:
+                self.conn.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k, _ in victims])
+            logger.info(f"Embedding cache: evicted {len(victims)} entries.")
+        taken = {row[0] for row in self.conn.execute("SELECT slot FROM entries")}
+        free = []
+        for slot in range(self.capacity):
+            if slot not in taken:
+                free.append(slot)
+                if len(free) == n:
+                    break
+        return free
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+            self.conn.close()
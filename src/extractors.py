@@ -0,0 +1,233 @@
+"""
+Pluggable article text extractors used by ScraperAgent.
+Every extractor turns an HTML page into plain text with one text block per line,
+boilerplate (scripts, styles, navigation, headers, footers, asides) removed and the
+result cut to max_chars.
+The parsing libraries (BeautifulSoup, lxml) are imported by the extractors on first use.
+"""
+import re
+
+BOILERPLATE_TAGS = ("script", "style", "nav", "footer", "header", "aside")
+
+# Line breaks and runs of two or more spaces separate text blocks
+_BLOCK_SPLIT = re.compile(r"[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]| {2,}")
+
+class BaseExtractor:
+    name = "base"
+
+    def extract(self, html, max_chars=10000):
+        """Returns the cleaned text of an HTML page (str or bytes), at most max_chars long."""
+        raise NotImplementedError
+
+    def extract_chunks(self, chunks, max_chars=10000, encoding=None):
+        """
+        Same as extract, for a page arriving as an iterable of byte chunks.
+        The default buffers the chunks, engines with an incremental parser override it.
+        """
+        html = b''.join(chunks)
+        if encoding:
+            html = html.decode(encoding, errors='replace')
+        return self.extract(html, max_chars)
+
+class SoupExtractor(BaseExtractor):
+    """
+    Basic boilerplate removal using BeautifulSoup.
+    Reference implementation, slow (pure Python html.parser and several passes over the text).
+    """
+    name = "soup"
+
+    def extract(self, html, max_chars=10000):
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(html, 'html.parser')
+
+        # Remove script and style elements
+        for script in soup(list(BOILERPLATE_TAGS)):
+            script.decompose()
+
+        # Get text
+        text = soup.get_text(separator=' ')
+
+        # Break into lines and remove leading/trailing space on each
+        lines = []
+        for line in text.splitlines():
+            lines.append(line.strip())
+        # Break multi-headlines into a line each
+        chunks = []
+        for line in lines:
+            for phrase in line.split("  "):
+                chunks.append(phrase.strip())
+        # Drop blank lines
+        final_chunks = []
+        for chunk in chunks:
+            if chunk:
+                final_chunks.append(chunk)
+        text = '\n'.join(final_chunks)
+
+        # Limit to reasonable length (e.g., 5000 chars) to fit context window if needed,
+        # though Gemini can handle large context.
+        return text[:max_chars]
+
+class _BlockCollector:
+    """Splits a stream of text nodes into text blocks until max_chars of text have been collected."""
+    def __init__(self, max_chars):
+        self.max_chars = max_chars
+        self.blocks = []
+        self.size = 0
+        self.pending = None
+
+    @property
+    def full(self):
+        return self.size >= self.max_chars
+
+    def add(self, text):
+        # Text nodes are joined with a space, like BeautifulSoup.get_text(separator=' ')
+        pending = text if self.pending is None else f"{self.pending} {text}"
+        pieces = _BLOCK_SPLIT.split(pending)
+        self.pending = pieces.pop()
+        for piece in pieces:
+            piece = piece.strip()
+            if piece:
+                self.blocks.append(piece)
+                self.size += len(piece) + 1
+
+    def text(self):
+        blocks = self.blocks
+        if not self.full and self.pending and self.pending.strip():
+            blocks = blocks + [self.pending.strip()]
+        return '\n'.join(blocks)[:self.max_chars]
+
+class _TextTarget:
+    """
+    lxml parser target: passes the text nodes of a page to a _BlockCollector as they are
+    parsed, leaving out boilerplate subtrees and comments, without building a tree.
+    """
+    def __init__(self, collector):
+        self.collector = collector
+        self.skip = 0
+        self.buffer = []
+
+    def _flush(self):
+        # libxml2 may deliver one text node in several pieces, any tag or comment ends it
+        if self.buffer:
+            text = ''.join(self.buffer)
+            self.buffer = []
+            if not self.collector.full:
+                self.collector.add(text)
+
+    def start(self, tag, attrib):
+        self._flush()
+        if self.skip or tag.lower() in BOILERPLATE_TAGS:
+            self.skip += 1
+
+    def end(self, tag):
+        self._flush()
+        if self.skip:
+            self.skip -= 1
+
+    def data(self, data):
+        if not self.skip:
+            self.buffer.append(data)
+
+    def comment(self, text):
+        self._flush()
+
+    def close(self):
+        self._flush()
+        return self.collector.text()
+
+class LxmlExtractor(BaseExtractor):
+    """
+    lxml (libxml2) based extractor.
+    Walks the text once, skipping boilerplate subtrees, splits it into blocks as it goes
+    and stops as soon as max_chars of text have been collected.
+    """
+    name = "lxml"
+
+    def extract(self, html, max_chars=10000):
+        root = self._parse(html)
+        if root is None:
+            return ""
+        return self.extract_tree(root, max_chars)
+
+    def extract_chunks(self, chunks, max_chars=10000, encoding=None):
+        """
+        Feeds the chunks to libxml2's incremental (push) parser with a target that collects
+        the text directly, no tree is built. Stops reading chunks once max_chars of text
+        have been collected, the rest of the page is neither parsed nor downloaded.
+        """
+        from lxml import etree
+        collector = _BlockCollector(max_chars)
+        try:
+            parser = etree.HTMLParser(target=_TextTarget(collector), encoding=encoding)
+        except LookupError:
+            parser = etree.HTMLParser(target=_TextTarget(collector))
+        fed = False
+        for chunk in chunks:
+            if chunk:
+                parser.feed(chunk)
+                fed = True
+            if collector.full:
+                break
+        if not fed:
+            return ""
+        try:
+            return parser.close()
+        except etree.XMLSyntaxError:
+            return ""
+
+    def _parse(self, html):
+        import lxml.html
+        if not html:
+            return None
+        try:
+            return lxml.html.document_fromstring(html)
+        except ValueError:
+            # lxml refuses str input that carries an XML encoding declaration
+            if isinstance(html, str):
+                return lxml.html.document_fromstring(html.encode('utf-8'))
+            raise
+        except lxml.etree.ParserError:
+            return None
+
+    def extract_tree(self, root, max_chars=10000):
+        collector = _BlockCollector(max_chars)
+        for text in self._iter_text(root):
+            collector.add(text)
+            if collector.full:
+                break
+        return collector.text()
+
+    @staticmethod
+    def _iter_text(root):
+        """Yields the text nodes of root in document order, leaving out boilerplate subtrees and comments."""
+        if root.text:
+            yield root.text
+        stack = [(root, iter(root))]
+        while stack:
+            parent, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                if stack and parent.tail:
+                    yield parent.tail
+                continue
+            tag = child.tag
+            if isinstance(tag, str) and tag.lower() not in BOILERPLATE_TAGS:
+                if child.text:
+                    yield child.text
+                stack.append((child, iter(child)))
+            elif child.tail:
+                # Skipped element (boilerplate, comment, processing instruction): keep only its tail
+                yield child.tail
+
+EXTRACTORS = {
+    SoupExtractor.name: SoupExtractor,
+    LxmlExtractor.name: LxmlExtractor,
+}
+
+def get_extractor(name):
+    """Instantiates an extractor by name ('lxml' or 'soup')."""
+    try:
+        return EXTRACTORS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown extractor '{name}', choose from {sorted(EXTRACTORS)}")
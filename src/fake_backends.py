@@ -0,0 +1,163 @@
+"""
+Local stand-ins for the Gemini APIs, used to exercise the agents offline
+(no API key, no network, deterministic output).
+"""
+import io
+import time
+import hashlib
+import threading
+import numpy as np
+from requests import Response
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+
+class FakeEmbeddingBackend:
+    """
+    Deterministic embedding backend with the same call shape as EmbeddingBatcher.embed_fn.
+    A text maps to the normalized sum of fixed pseudo-random vectors of its words (derived
+    from their hashes), so identical texts always get identical vectors and, like real
+    embeddings, texts sharing most of their words are close while unrelated texts are not.
+    latency is added per call, fail_first makes the first n calls raise (to exercise retries).
+    """
+    def __init__(self, dim=64, latency=0.0, fail_first=0):
+        self.dim = dim
+        self.latency = latency
+        self.fail_first = fail_first
+        self.calls = 0
+        self.texts_embedded = 0
+        self._lock = threading.Lock()
+        # word -> vector, shared by every call
+        self._words = {}
+
+    def _word_vector(self, word):
+        v = self._words.get(word)
+        if v is None:
+            seed = int.from_bytes(hashlib.sha256(word.encode('utf-8')).digest()[:8], 'little')
+            v = self._words[word] = np.random.default_rng(seed).standard_normal(self.dim)
+        return v
+
+    def vector(self, text):
+        words = text.lower().split() or ['']
+        v = np.sum([self._word_vector(word) for word in words], axis=0)
+        return (v / np.linalg.norm(v)).tolist()
+
+    def __call__(self, texts):
+        with self._lock:
+            self.calls += 1
+            should_fail = self.calls <= self.fail_first
+        if self.latency:
+            time.sleep(self.latency)
+        if should_fail:
+            raise RuntimeError("Fake embedding backend failure")
+        with self._lock:
+            self.texts_embedded += len(texts)
+        return [self.vector(text) for text in texts]
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """
+    Stand-in for genai.GenerativeModel.generate_content.
+    Returns a deterministic Markdown "briefing" listing the sources found in the prompt
+    after waiting latency seconds. Tracks the number of calls and peak concurrency.
+    With stream=True the briefing arrives in stream_chunks pieces spread over latency.
+    """
+    def __init__(self, latency=0.0, stream_chunks=10):
+        self.latency = latency
+        self.stream_chunks = stream_chunks
+        self.calls = 0
+        self.prompts = []
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _briefing(self, prompt):
+        sources = [line for line in prompt.splitlines() if line.startswith('--- SOURCE')]
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8]
+        lines = [f"## Briefing {digest}", "", f"Synthesized from {len(sources)} sources.", ""]
+        lines += [f"- {line.strip('- ')}" for line in sources]
+        return '\n'.join(lines)
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        if stream:
+            return self._stream(prompt)
+        with self._lock:
+            self.calls += 1
+            self.prompts.append(prompt)
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            return FakeResponse(self._briefing(prompt))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _stream(self, prompt):
+        with self._lock:
+            self.calls += 1
+            self.prompts.append(prompt)
+        text = self._briefing(prompt)
+        size = max(1, -(-len(text) // self.stream_chunks))
+        for start in range(0, len(text), size):
+            if self.latency:
+                time.sleep(self.latency / self.stream_chunks)
+            yield FakeResponse(text[start:start + size])
+
+
+class FakeHTTPAdapter(BaseAdapter):
+    """
+    requests transport adapter answering from memory, mount it on an agent's session to
+    poll feeds and scrape pages without a network:
+
+        poller.session.mount('http://', FakeHTTPAdapter(routes))
+
+    routes maps URL -> (body bytes, content type), unknown URLs get a 404.
+    latency is added per request.
+    """
+    def __init__(self, routes, latency=0.0):
+        super().__init__()
+        self.routes = routes
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        response = Response()
+        response.request = request
+        response.url = request.url
+        route = self.routes.get(request.url)
+        if route is None:
+            response.status_code = 404
+            response.headers = CaseInsensitiveDict({'Content-Type': 'text/plain'})
+            response.raw = io.BytesIO(b'')
+        else:
+            body, content_type = route
+            response.status_code = 200
+            response.headers = CaseInsensitiveDict({'Content-Type': content_type, 'Content-Length': str(len(body))})
+            response.raw = io.BytesIO(body)
+        response.encoding = None
+        return response
+
+    def __getstate__(self):
+        # Sent to worker processes (src/sharding.py) without the lock
+        state = dict(self.__dict__)
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def close(self):
+        pass
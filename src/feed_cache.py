@@ -0,0 +1,133 @@
+import re
+import json
+import os
+import threading
+import logging
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_FILE = os.path.join(".cache", "feed_cache.json")
+DEFAULT_HOSTS_DIR = os.path.join(".cache", "feed_cache.hosts")
+
+class FeedCache:
+    """
+    Persistent per-feed HTTP validator cache.
+    Stores the ETag / Last-Modified validators of every feed together with the articles
+    extracted from its last full download, so a 304 Not Modified can be answered without
+    re-parsing. Also keeps per-feed hit/miss counters.
+    """
+    def __init__(self, path=DEFAULT_CACHE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._feeds = self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Could not load feed cache {self.path}, starting empty: {e}")
+            return {}
+
+    def get(self, feed_url):
+        with self._lock:
+            return self._feeds.get(feed_url)
+
+    def conditional_headers(self, feed_url):
+        """Returns the If-None-Match / If-Modified-Since headers for a feed, if any are known."""
+        entry = self.get(feed_url)
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def record_hit(self, feed_url):
+        with self._lock:
+            entry = self._feeds.setdefault(feed_url, {})
+            entry['hits'] = entry.get('hits', 0) + 1
+
+    def store(self, feed_url, etag, last_modified, articles):
+        """Saves fresh validators and articles after a full (200) download."""
+        with self._lock:
+            entry = self._feeds.setdefault(feed_url, {})
+            entry['etag'] = etag
+            entry['last_modified'] = last_modified
+            entry['articles'] = articles
+            entry['misses'] = entry.get('misses', 0) + 1
+
+    def stats(self):
+        """Returns {feed_url: {'hits': int, 'misses': int}}."""
+        with self._lock:
+            return {
+                url: {'hits': entry.get('hits', 0), 'misses': entry.get('misses', 0)}
+                for url, entry in self._feeds.items()
+            }
+
+    def save(self):
+        """Writes the cache atomically (temp file + rename)."""
+        if not self.path:
+            return
+        with self._lock:
+            data = json.dumps(self._feeds)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Could not save feed cache {self.path}: {e}")
+
+class HostFeedCache:
+    """
+    FeedCache split into one file per feed host, in directory, for the sharded poller.
+    A host's feeds are always polled by the same shard whatever the number of shards, so
+    workers never write the same file and changing the shard count keeps every validator.
+    Files are loaded on first use, save() writes the loaded ones.
+    """
+    def __init__(self, directory=DEFAULT_HOSTS_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._caches = {}
+
+    def _cache(self, feed_url):
+        host = (urlsplit(feed_url).hostname or '').lower()
+        name = re.sub(r'[^a-z0-9.-]', '_', host) or '_'
+        with self._lock:
+            if name not in self._caches:
+                self._caches[name] = FeedCache(os.path.join(self.directory, f"{name}.json"))
+            return self._caches[name]
+
+    def get(self, feed_url):
+        return self._cache(feed_url).get(feed_url)
+
+    def conditional_headers(self, feed_url):
+        return self._cache(feed_url).conditional_headers(feed_url)
+
+    def record_hit(self, feed_url):
+        self._cache(feed_url).record_hit(feed_url)
+
+    def store(self, feed_url, etag, last_modified, articles):
+        self._cache(feed_url).store(feed_url, etag, last_modified, articles)
+
+    def stats(self):
+        with self._lock:
+            caches = list(self._caches.values())
+        stats = {}
+        for cache in caches:
+            stats.update(cache.stats())
+        return stats
+
+    def save(self):
+        with self._lock:
+            caches = list(self._caches.values())
+        for cache in caches:
+            cache.save()
@@ -0,0 +1,224 @@
+import os
+import pickle
+import logging
+from datetime import datetime
+import numpy as np
+
+from src.similarity import to_unit_matrix
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_FILE = os.path.join(".cache", "clusters.pkl")
+
+class IncrementalClusterer:
+    """
+    Online centroid clustering that keeps its state between runs.
+    New vectors join the nearest cluster if they are within eps (cosine distance) of its
+    centroid, otherwise they start a new one. Clusters whose centroids drift within
+    merge_eps of each other are merged. Articles leave their cluster when they fall out
+    of the time window. Cluster IDs are stable across runs, so growth can be tracked.
+    The normalized centroids are kept in one preallocated matrix (capacity doubles as it
+    fills, rows of removed clusters are reused) that is updated row by row, so assigning an
+    article costs one matrix-vector product whatever the number of clusters.
+    """
+    def __init__(self, eps=0.25, merge_eps=None, state_path=DEFAULT_STATE_FILE):
+        self.eps = eps
+        self.merge_eps = merge_eps if merge_eps is not None else eps / 2
+        self.state_path = state_path
+        # cluster_id -> {'sum': summed unit vectors, 'members': {article_id: (article, vector)}, 'previous_size': int}
+        self.clusters = {}
+        self.article_cluster = {}
+        self.next_id = 1
+        self._load()
+        self._reindex()
+
+    @staticmethod
+    def article_key(article):
+        return article.get('id') or article.get('link', '')
+
+    def __contains__(self, article):
+        return self.article_key(article) in self.article_cluster
+
+    def _load(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, 'rb') as f:
+                state = pickle.load(f)
+            self.clusters = state['clusters']
+            self.next_id = state['next_id']
+            self.article_cluster = {aid: cid for cid, c in self.clusters.items() for aid in c['members']}
+        except Exception as e:
+            logger.warning(f"Could not load cluster state {self.state_path}, starting empty: {e}")
+
+    def save(self):
+        """Persists the state and marks the current sizes as the baseline for the next run."""
+        for cluster in self.clusters.values():
+            cluster['previous_size'] = len(cluster['members'])
+        if not self.state_path:
+            return
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'clusters': self.clusters, 'next_id': self.next_id}, f)
+        os.replace(tmp_path, self.state_path)
+
+    # --- centroid matrix: row r of self._matrix is the unit centroid of cluster self._ids[r] ---
+
+    def _reindex(self):
+        """Rebuilds the centroid matrix from the cluster sums (after loading the state)."""
+        self._ids = []
+        self._rows = {}
+        self._matrix = None
+        for cid in self.clusters:
+            self._set_row(cid)
+
+    def _set_row(self, cid):
+        """Writes the centroid of cid into its row, appending a row for a new cluster."""
+        total = self.clusters[cid]['sum']
+        row = self._rows.get(cid)
+        if row is None:
+            row = len(self._ids)
+            if self._matrix is None:
+                self._matrix = np.zeros((64, total.shape[0]), dtype=np.float32)
+            elif row == len(self._matrix):
+                grown = np.zeros((2 * len(self._matrix), self._matrix.shape[1]), dtype=np.float32)
+                grown[:row] = self._matrix
+                self._matrix = grown
+            self._ids.append(cid)
+            self._rows[cid] = row
+        self._matrix[row] = total / max(np.linalg.norm(total), 1e-12)
+
+    def _drop_row(self, cid):
+        """Frees the row of a removed cluster by moving the last row into it."""
+        row = self._rows.pop(cid)
+        last = len(self._ids) - 1
+        if row != last:
+            moved = self._ids[last]
+            self._matrix[row] = self._matrix[last]
+            self._ids[row] = moved
+            self._rows[moved] = row
+        self._ids.pop()
+
+    def _centroids(self):
+        """(cluster ids, unit centroid matrix), row aligned. The matrix is a view, not a copy."""
+        if self._matrix is None:
+            return self._ids, np.zeros((0, 0), dtype=np.float32)
+        return self._ids, self._matrix[:len(self._ids)]
+
+    def add(self, articles, vectors):
+        """Assigns new articles (and their embeddings) to clusters. Known articles are ignored."""
+        if not articles:
+            return
+        X = to_unit_matrix(vectors)
+        touched = set()
+
+        for article, vector in zip(articles, X):
+            aid = self.article_key(article)
+            if not aid or aid in self.article_cluster:
+                continue
+            best = None
+            ids, centroids = self._centroids()
+            if ids:
+                sims = centroids @ vector
+                nearest = int(np.argmax(sims))
+                if 1.0 - sims[nearest] <= self.eps:
+                    best = ids[nearest]
+            if best is None:
+                best = self.next_id
+                self.next_id += 1
+                self.clusters[best] = {'sum': np.zeros_like(vector), 'members': {}, 'previous_size': 0}
+            cluster = self.clusters[best]
+            cluster['members'][aid] = (article, vector)
+            cluster['sum'] = cluster['sum'] + vector
+            self.article_cluster[aid] = best
+            touched.add(best)
+            self._set_row(best)
+
+        self._merge(touched)
+
+    def _merge(self, touched, block_size=1024):
+        """
+        Merges touched clusters into any cluster whose centroid is within merge_eps.
+        Candidate pairs come from one blocked product of the touched centroids with all of
+        them, each pair is re-checked against the current centroids before merging (earlier
+        merges in the pass move them).
+        """
+        ids, centroids = self._centroids()
+        rows = [self._rows[cid] for cid in sorted(touched) if cid in self._rows]
+        threshold = 1.0 - self.merge_eps
+        pairs = []
+        for start in range(0, len(rows), block_size):
+            block = rows[start:start + block_size]
+            sims = centroids[block] @ centroids.T
+            for i, j in zip(*np.nonzero(sims >= threshold)):
+                if block[i] != j:
+                    pairs.append((ids[block[i]], ids[j]))
+
+        merged_into = {}
+
+        def current(cid):
+            while cid in merged_into:
+                cid = merged_into[cid]
+            return cid
+
+        for cid, other in pairs:
+            cid, other = current(cid), current(other)
+            if cid == other or self._matrix[self._rows[cid]] @ self._matrix[self._rows[other]] < threshold:
+                continue
+            # The larger (then older) cluster keeps its ID
+            keep, gone = sorted((cid, other), key=lambda c: (-len(self.clusters[c]['members']), c))
+            self._absorb(keep, gone)
+            merged_into[gone] = keep
+
+    def _absorb(self, keep, gone):
+        target, source = self.clusters[keep], self.clusters.pop(gone)
+        target['members'].update(source['members'])
+        target['sum'] = target['sum'] + source['sum']
+        target['previous_size'] += source['previous_size']
+        for aid in source['members']:
+            self.article_cluster[aid] = keep
+        self._drop_row(gone)
+        self._set_row(keep)
+        logger.info(f"Merged cluster {gone} into {keep}.")
+
+    def expire(self, cutoff_time):
+        """Drops articles published before cutoff_time and removes clusters left empty."""
+        removed = 0
+        for cid in list(self.clusters):
+            cluster = self.clusters[cid]
+            size = len(cluster['members'])
+            for aid, (article, vector) in list(cluster['members'].items()):
+                published = article.get('published')
+                if published and datetime.fromisoformat(published) <= cutoff_time:
+                    del cluster['members'][aid]
+                    del self.article_cluster[aid]
+                    cluster['sum'] = cluster['sum'] - vector
+                    removed += 1
+            if not cluster['members']:
+                del self.clusters[cid]
+                self._drop_row(cid)
+            elif len(cluster['members']) != size:
+                self._set_row(cid)
+        if removed:
+            logger.info(f"Expired {removed} articles from cluster state.")
+        return removed
+
+    def current_clusters(self, min_size=1):
+        """
+        Returns clusters with at least min_size articles, largest first, as dicts with
+        'id', 'articles', 'size' and 'previous_size' (size at the end of the previous run).
+        """
+        result = []
+        for cid, cluster in self.clusters.items():
+            size = len(cluster['members'])
+            if size >= min_size:
+                result.append({
+                    'id': cid,
+                    'articles': [article for article, _ in cluster['members'].values()],
+                    'size': size,
+                    'previous_size': cluster['previous_size'],
+                })
+        return sorted(result, key=lambda c: c['size'], reverse=True)
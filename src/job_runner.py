@@ -0,0 +1,98 @@
+"""
+Runs the pipeline in a background thread so callers (the Streamlit app) stay responsive.
+A Job records the run's status, current stage and streamed briefing text; callers poll
+job.snapshot() instead of blocking on the run.
+"""
+import time
+import uuid
+import threading
+import logging
+
+from src.run_lease import RunInProgress
+
+logger = logging.getLogger(__name__)
+
+class Job:
+    """State of one background run, updated from its worker threads."""
+    def __init__(self, stages=()):
+        self.id = uuid.uuid4().hex[:8]
+        self.stages = tuple(stages)
+        self._lock = threading.Lock()
+        # 'running', then 'completed', 'busy' (another run held the lease) or 'failed'
+        self.status = 'running'
+        self.stage = None
+        self.outcome = None
+        self.error = None
+        self.started_at = time.time()
+        self.finished_at = None
+        self.texts = {}
+
+    def set_stage(self, stage):
+        with self._lock:
+            self.stage = stage
+
+    def add_chunk(self, index, text):
+        with self._lock:
+            self.texts[index] = self.texts.get(index, '') + text
+
+    def finish(self, status, outcome=None, error=None):
+        with self._lock:
+            self.status = status
+            self.outcome = outcome
+            self.error = error
+            self.finished_at = time.time()
+
+    @property
+    def done(self):
+        return self.status != 'running'
+
+    def progress(self):
+        """Fraction of the stages started so far (1.0 once finished)."""
+        if self.done:
+            return 1.0
+        if self.stage not in self.stages:
+            return 0.0
+        return self.stages.index(self.stage) / len(self.stages)
+
+    def snapshot(self):
+        """Consistent copy of the job's state for rendering."""
+        with self._lock:
+            return {
+                'id': self.id,
+                'status': self.status,
+                'stage': self.stage,
+                'progress': self.progress(),
+                'outcome': self.outcome,
+                'error': self.error,
+                'elapsed': (self.finished_at or time.time()) - self.started_at,
+                'texts': [self.texts[idx] for idx in sorted(self.texts)],
+            }
+
+class JobRunner:
+    """Starts at most one background pipeline run at a time and keeps the latest job."""
+    def __init__(self, orchestrator_factory):
+        # Called in the worker thread, so a slow first construction doesn't block the caller
+        self.orchestrator_factory = orchestrator_factory
+        self._lock = threading.Lock()
+        self.job = None
+
+    def start(self, force=True):
+        """Starts a run unless one is already running. Returns the (new or running) job."""
+        with self._lock:
+            if self.job is not None and not self.job.done:
+                return self.job
+            from src.orchestrator import Orchestrator
+            job = self.job = Job(Orchestrator.STAGES)
+        threading.Thread(target=self._run, args=(job, force), name=f"job-{job.id}", daemon=True).start()
+        return job
+
+    def _run(self, job, force):
+        try:
+            orchestrator = self.orchestrator_factory()
+            outcome = orchestrator.run_pipeline(force=force, on_chunk=job.add_chunk, on_progress=job.set_stage)
+            job.finish('completed', outcome=outcome)
+        except RunInProgress as e:
+            job.finish('busy', error=str(e))
+        except Exception as e:
+            logger.exception(f"Background run {job.id} failed")
+            job.finish('failed', error=str(e))
@@ -0,0 +1,326 @@
+"""
+In-process instrumentation shared by the agents: counters, gauges and latency histograms,
+a per-run JSON report, a Prometheus text exposition endpoint and opt-in profiling.
+Every agent records into the module level METRICS registry, metric names can carry labels:
+
+    METRICS.inc('cache_lookups', cache='feed', result='hit')
+    with METRICS.timer('stage', stage='poll'):      # -> stage_seconds{stage="poll"}
+        ...
+"""
+import os
+import sys
+import time
+import math
+import bisect
+import cProfile
+import threading
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, growing by 1.5x from 1ms to ~190s (local cache hits to slow LLM
+# generations), so percentiles estimated from the buckets are within the bucket width
+DEFAULT_BUCKETS = tuple(round(0.001 * 1.5 ** i, 6) for i in range(31)) + (math.inf,)
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+def _render(key):
+    name, labels = key
+    if not labels:
+        return name
+    return name + '{' + ','.join(f'{k}="{v}"' for k, v in labels) + '}'
+
+class Metrics:
+    """
+    keep_samples=True also stores every raw histogram observation so reports give exact
+    percentiles instead of bucket estimates (for benchmarks, memory grows with each observation).
+    """
+    def __init__(self, prefix="rssai", buckets=DEFAULT_BUCKETS, keep_samples=False):
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self.keep_samples = keep_samples
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        # key -> [per-bucket counts, sum, count]
+        self._histograms = {}
+        self._samples = {}
+
+    def inc(self, name, amount=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = _key(name, labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            hist[0][idx] += 1
+            hist[1] += value
+            hist[2] += 1
+            if self.keep_samples:
+                self._samples.setdefault(key, []).append(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observes the duration of the block into the histogram name_seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(f"{name}_seconds", time.perf_counter() - started, **labels)
+
+    def snapshot(self):
+        """Copy of the current values, pass it to report(since=...) to get the activity in between."""
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges),
+                'histograms': {k: (list(v[0]), v[1], v[2]) for k, v in self._histograms.items()},
+                'sample_counts': {k: len(v) for k, v in self._samples.items()},
+            }
+
+    def merge(self, snapshot):
+        """
+        Adds the counters and histograms of another registry's snapshot() (e.g. from a worker
+        process) to this one. Gauges take the snapshot's values.
+        """
+        with self._lock:
+            for key, value in snapshot['counters'].items():
+                self._counters[key] = self._counters.get(key, 0) + value
+            self._gauges.update(snapshot['gauges'])
+            for key, (counts, total, count) in snapshot['histograms'].items():
+                hist = self._histograms.get(key)
+                if hist is None:
+                    hist = self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+                hist[0] = [a + b for a, b in zip(hist[0], counts)]
+                hist[1] += total
+                hist[2] += count
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+            self._samples.clear()
+
+    def report(self, since=None):
+        """
+        JSON-ready summary: counters, gauges, histograms (count, sum, mean, estimated
+        p50/p95/p99) and the hit rate of every cache recorded under cache_lookups.
+        With since (a snapshot), counters and histograms only cover what happened after it.
+        """
+        now = self.snapshot()
+        before = since or {'counters': {}, 'histograms': {}, 'sample_counts': {}}
+        counters = {k: v - before['counters'].get(k, 0) for k, v in now['counters'].items()}
+        counters = {k: v for k, v in counters.items() if v}
+
+        histograms = {}
+        for key, (counts, total, count) in now['histograms'].items():
+            old_counts, old_total, old_count = before['histograms'].get(key, ([0] * len(counts), 0.0, 0))
+            counts = [a - b for a, b in zip(counts, old_counts)]
+            count -= old_count
+            total -= old_total
+            if not count:
+                continue
+            mean = round(total / count, 6)
+            with self._lock:
+                samples = self._samples.get(key, [])[before['sample_counts'].get(key, 0):]
+            if len(samples) == count:
+                quantile = lambda q: self._exact_quantile(sorted(samples), q)
+            elif count == 1:
+                # A single observation is known exactly
+                quantile = lambda q: mean
+            else:
+                quantile = lambda q: self._quantile(counts, count, q)
+            histograms[_render(key)] = {
+                'count': count,
+                'sum': round(total, 6),
+                'mean': mean,
+                'p50': quantile(0.50),
+                'p95': quantile(0.95),
+                'p99': quantile(0.99),
+            }
+
+        lookups = {}
+        for (name, labels), value in counters.items():
+            if name == 'cache_lookups':
+                labels = dict(labels)
+                per_cache = lookups.setdefault(labels.get('cache', ''), Counter())
+                per_cache[labels.get('result', '')] += value
+        hit_rates = {cache: round(c['hit'] / sum(c.values()), 4) for cache, c in lookups.items() if sum(c.values())}
+
+        return {
+            'counters': {_render(k): v for k, v in sorted(counters.items())},
+            'gauges': {_render(k): v for k, v in sorted(now['gauges'].items())},
+            'histograms': dict(sorted(histograms.items())),
+            'cache_hit_rates': hit_rates,
+        }
+
+    @staticmethod
+    def _exact_quantile(values, q):
+        """Linear interpolation between closest ranks of sorted values."""
+        pos = (len(values) - 1) * q
+        low = math.floor(pos)
+        high = min(low + 1, len(values) - 1)
+        return round(values[low] + (values[high] - values[low]) * (pos - low), 6)
+
+    def _quantile(self, counts, count, q):
+        """Quantile estimated by linear interpolation inside the bucket it falls in."""
+        rank = q * count
+        cumulative = 0
+        for idx, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = self.buckets[idx - 1] if idx else 0.0
+                upper = self.buckets[idx]
+                if math.isinf(upper):
+                    return lower
+                return round(lower + (upper - lower) * (rank - cumulative) / bucket_count, 6)
+            cumulative += bucket_count
+        return 0.0
+
+    def to_prometheus(self):
+        """Current values in the Prometheus text exposition format."""
+        snap = self.snapshot()
+        lines = []
+        typed = set()
+
+        def header(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(snap['counters'].items()):
+            metric = f"{self.prefix}_{name}_total"
+            header(metric, "counter")
+            lines.append(f"{_render((metric, labels))} {value}")
+        for (name, labels), value in sorted(snap['gauges'].items()):
+            metric = f"{self.prefix}_{name}"
+            header(metric, "gauge")
+            lines.append(f"{_render((metric, labels))} {value}")
+        for (name, labels), (counts, total, count) in sorted(snap['histograms'].items()):
+            metric = f"{self.prefix}_{name}"
+            header(metric, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = "+Inf" if math.isinf(bound) else repr(bound)
+                lines.append(f"{_render((metric + '_bucket', labels + (('le', le),)))} {cumulative}")
+            lines.append(f"{_render((metric + '_sum', labels))} {total}")
+            lines.append(f"{_render((metric + '_count', labels))} {count}")
+        return '\n'.join(lines) + '\n'
+
+METRICS = Metrics()
+
+def serve_prometheus(port=9108, host="127.0.0.1", registry=METRICS):
+    """
+    Serves registry.to_prometheus() on http://host:port/metrics from a daemon thread.
+    Local only by default, pass host="0.0.0.0" to let a remote Prometheus scrape it.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip('/') not in ('', '/metrics'):
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = registry.to_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"Serving Prometheus metrics on http://{host}:{port}/metrics")
+    return server
+
+class SamplingProfiler:
+    """
+    Statistical profiler covering every thread: samples all stacks every interval seconds
+    and writes them in the collapsed format read by flamegraph.pl and speedscope.
+    """
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+@contextmanager
+def profiled(mode, directory=os.path.join(".cache", "profiles"), name="run"):
+    """
+    Profiles the block when mode is 'cprofile' (calling thread only, .prof file for pstats
+    or snakeviz) or 'sample' (all threads, collapsed stacks). Does nothing when mode is None.
+    """
+    if not mode:
+        yield None
+        return
+    if mode not in ('cprofile', 'sample'):
+        raise ValueError(f"Unknown profiler '{mode}', choose 'cprofile' or 'sample'")
+    os.makedirs(directory, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    if mode == 'cprofile':
+        path = os.path.join(directory, f"{name}-{stamp}.prof")
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield path
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
+            logger.info(f"cProfile stats written to {path}")
+    else:
+        path = os.path.join(directory, f"{name}-{stamp}.collapsed")
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            yield path
+        finally:
+            profiler.stop()
+            profiler.write(path)
+            logger.info(f"Sampled stacks written to {path}")
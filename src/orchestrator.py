@@ -1,135 +1,386 @@
-import time
-import json
-import logging
-import sys
-import os
-from datetime import datetime
-
-# Ensure the root of the project is in sys.path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-
-from src.rss_poller import RSSPoller
-from src.trend_detector import TrendDetector
-from src.scraper_agent import ScraperAgent
-from src.synthesis_agent import SynthesisAgent
-
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("agent.log"),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger("Orchestrator")
-
-DATA_FILE = "briefing_data.json"
-
-class Orchestrator:
-    def __init__(self):
-        self.poller = RSSPoller()
-        self.detector = TrendDetector()
-        self.scraper = ScraperAgent()
-        self.synthesizer = SynthesisAgent()
-        
-    def load_feeds(self):
-        try:
-            with open('feeds.json', 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            logger.error(f"Could not load feeds.json: {e}")
-            return []
-
-    def run_pipeline(self):
-        logger.info("Starting pipeline run...")
-        feeds = self.load_feeds()
-        
-        # Poll Feeds
-        articles = self.poller.fetch_feeds(feeds, time_window_hours=24.0) # Using 24h for demo purposes to ensure we get data
-        # Note: User request asked for 15 min poll and 1h window for trends. 
-        # For initial run/demo, 24h ensures we find something.
-        
-        if not articles:
-            logger.info("No articles found.")
-            return
-
-        # Detect Trends
-        logger.info(f"Analyzing {len(articles)} articles for trends...")
-        clusters = self.detector.detect_clusters(articles)
-        
-        # Filter for significant clusters
-        # Priority 1: Trend (>5), Priority 2: Emerging (>2), Priority 3: Latest (Fallback)
-        significant_clusters = []
-        for c in clusters:
-            if len(c) >= 5:
-                significant_clusters.append(c)
-
-        emerging_clusters = []
-        for c in clusters:
-            if 2 <= len(c) < 5:
-                emerging_clusters.append(c)
-        
-        briefing_type = "General Update"
-        target_articles = []
-        
-        if significant_clusters:
-            briefing_type = "Trending Narrative"
-            target_articles = sorted(significant_clusters, key=len, reverse=True)[0]
-            logger.info(f"Found {len(significant_clusters)} trends. Processing top trend.")
-            
-        elif emerging_clusters:
-            briefing_type = "Emerging Topic"
-            target_articles = sorted(emerging_clusters, key=len, reverse=True)[0]
-            logger.info(f"No major trends. Processing top emerging topic.")
-            
-        else:
-            briefing_type = "Latest News Snapshot"
-            target_articles = articles[:5]
-            logger.info("No clusters found. Processing latest articles.")
-
-        # Scrape URLs
-        # Extract unique URLs from target articles
-        urls = []
-        seen_links = set()
-        for a in target_articles:
-            link = a['link']
-            if link not in seen_links:
-                urls.append(link)
-                seen_links.add(link)
-        urls = urls[:5]
-        scrape_results = self.scraper.scrape_urls(urls)
-        
-        # Synthesize
-        logger.info(f"Synthesizing briefing ({briefing_type})...")
-        briefing_text = self.synthesizer.synthesize_briefing(scrape_results)
-        
-        # Save Results
-        output = {
-            "timestamp": datetime.now().isoformat(),
-            "briefing_type": briefing_type,
-            "briefing": briefing_text,
-            "sources": target_articles, # Metadata for briefing sources
-            "trend_size": len(target_articles),
-            "all_articles": articles[:50] # Save top 50 recent articles for raw feed
-        }
-        
-        with open(DATA_FILE, 'w') as f:
-            json.dump(output, f, indent=2)
-            
-        logger.info("Briefing generated and saved.")
-
-    def start_loop(self, interval_minutes=15):
-        logger.info(f"Starting agent loop, interval {interval_minutes} minutes.")
-        while True:
-            try:
-                self.run_pipeline()
-            except Exception as e:
-                logger.error(f"Pipeline failed: {e}")
-            
-            logger.info(f"Sleeping for {interval_minutes} minutes...")
-            time.sleep(interval_minutes * 60)
-
-if __name__ == "__main__":
-    orchestrator = Orchestrator()
-    orchestrator.run_pipeline()
+import time
+import json
+import logging
+import sys
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+# Ensure the root of the project is in sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.rss_poller import RSSPoller, normalize_feeds
+from src.trend_detector import TrendDetector
+from src.scraper_agent import ScraperAgent
+from src.synthesis_agent import SynthesisAgent
+from src.article_store import ArticleStore
+from src.briefing_store import BriefingStore
+from src.run_lease import RunLease, RunInProgress, LeaseLost
+from src.metrics import METRICS, profiled
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler("agent.log"),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger("Orchestrator")
+
+# Written by older versions, imported into the briefing store on first start
+LEGACY_DATA_FILE = "briefing_data.json"
+# Articles saved with each run for the app's raw feed
+FEED_LIMIT = 500
+FEEDS_FILE = "feeds.json"
+# Metrics of the last run (stage timings, counters, cache hit rates, API latencies)
+REPORT_FILE = "run_report.json"
+
+class Orchestrator:
+    # Stages of run_pipeline, in order, as reported to on_progress
+    STAGES = ('poll', 'store', 'cluster', 'briefings', 'save')
+
+    def __init__(self, cluster_mode='dbscan', top_k=1, synthesizer=None, profile=None, shards=0, extract_processes=0):
+        self.poller = RSSPoller()
+        self.detector = TrendDetector(mode=cluster_mode)
+        # extract_processes > 0 moves HTML extraction of scraped pages to a process pool
+        self.scraper = ScraperAgent(extract_processes=extract_processes)
+        self.synthesizer = synthesizer or SynthesisAgent()
+        self.store = ArticleStore()
+        # shards > 0 polls feeds.json on that many worker processes, see src/sharding.py
+        self.sharded_poller = None
+        if shards:
+            from src.sharding import ShardedPoller
+            self.sharded_poller = ShardedPoller(shards, store_path=self.store.path)
+        self.briefings = BriefingStore()
+        if not self.briefings.has_runs() and os.path.exists(LEGACY_DATA_FILE):
+            self.briefings.import_json(LEGACY_DATA_FILE)
+        # Using 24h for demo purposes to ensure we get data
+        # Note: User request asked for 15 min poll and 1h window for trends. 
+        # For initial run/demo, 24h ensures we find something.
+        self.time_window_hours = 24.0
+        # Number of trends briefed per run, synthesized concurrently
+        self.top_k = top_k
+        # Only one run at a time across the scheduler, the app and manual runs. The lease is
+        # renewed while a run holds it, set when a renewal fails
+        self.lease = RunLease()
+        self.lease_lost = threading.Event()
+        # feeds.json is re-read only when it changes on disk
+        self._feeds = None
+        self._feeds_mtime = None
+        # Opt-in per-run profiling: 'cprofile' or 'sample' (all threads), see src/metrics.py
+        self.profile = profile or os.getenv("RSSAI_PROFILE")
+        self.last_report = None
+        
+    def load_feed_config(self):
+        """Returns the feeds.json entries as dicts with 'url' and 'interval_minutes'."""
+        try:
+            mtime = os.path.getmtime(FEEDS_FILE)
+            if self._feeds is None or mtime != self._feeds_mtime:
+                with open(FEEDS_FILE, 'r') as f:
+                    self._feeds = normalize_feeds(json.load(f))
+                self._feeds_mtime = mtime
+            return self._feeds
+        except Exception as e:
+            logger.error(f"Could not load feeds.json: {e}")
+            return []
+
+    def load_feeds(self):
+        return [feed['url'] for feed in self.load_feed_config()]
+
+    @contextmanager
+    def exclusive(self, on_lost=None):
+        """
+        Holds the run lease for the duration of the block, raises RunInProgress if it is taken.
+        A heartbeat thread renews it every ttl/3 seconds. If a renewal fails, lease_lost is set
+        and on_lost() is called, the run must then stop before it saves anything (see _stage).
+        """
+        if not self.lease.acquire():
+            raise RunInProgress(f"Another pipeline run is in progress ({self.lease.holder()}).")
+        self.lease_lost.clear()
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(stop, on_lost), name="lease-heartbeat", daemon=True)
+        heartbeat.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            heartbeat.join()
+            self.lease.release()
+
+    def _heartbeat(self, stop, on_lost):
+        while not stop.wait(self.lease.ttl / 3):
+            try:
+                renewed = self.lease.renew()
+            except sqlite3.Error as e:
+                # Retried on the next beat, the lease is still valid for 2/3 of its ttl
+                logger.warning(f"Could not renew the run lease: {e}")
+                continue
+            if not renewed:
+                logger.error("Lost the run lease, another run may have taken over. Aborting this run.")
+                self.lease_lost.set()
+                if on_lost is not None:
+                    on_lost()
+                return
+
+    def check_lease(self):
+        """Raises LeaseLost if the current run's lease could not be renewed."""
+        if self.lease_lost.is_set():
+            raise LeaseLost("The run lease was lost, the run was aborted.")
+
+    @contextmanager
+    def instrumented(self, mode):
+        """
+        Profiles the run when enabled and writes its report to REPORT_FILE: outcome, duration
+        and every metric recorded while it ran. The block sets run['outcome'].
+        """
+        run = {'mode': mode, 'outcome': 'failed', 'started_at': datetime.now(timezone.utc).isoformat()}
+        before = METRICS.snapshot()
+        started = time.perf_counter()
+        try:
+            with profiled(self.profile) as profile_path:
+                run['profile'] = profile_path
+                yield run
+        finally:
+            run['duration_seconds'] = round(time.perf_counter() - started, 3)
+            METRICS.observe('run_seconds', run['duration_seconds'], mode=mode)
+            METRICS.inc('runs', outcome=run['outcome'])
+            run.update(METRICS.report(since=before))
+            self.last_report = run
+            self.save_report(run)
+
+    def save_report(self, report):
+        """Writes the run report atomically (temp file + rename)."""
+        tmp_path = f"{REPORT_FILE}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(report, f, indent=2)
+            os.replace(tmp_path, REPORT_FILE)
+        except OSError as e:
+            logger.error(f"Could not write {REPORT_FILE}: {e}")
+
+    def run_pipeline(self, force=False, on_chunk=None, feeds=None, on_progress=None):
+        """
+        Runs one poll -> cluster -> scrape -> synthesize cycle and returns its outcome.
+        The cycle is skipped when no new articles arrived since the last run, unless force=True.
+        on_chunk(index, text), if given, receives each briefing as it streams from the model
+        (index is the briefing's position in the output). It is called from worker threads.
+        on_progress(stage), if given, is called as each of STAGES starts.
+        feeds limits polling to a subset of the feed URLs (default: all of feeds.json).
+        Raises RunInProgress if another run holds the lease.
+        """
+        with self.exclusive(), self.instrumented('sequential') as run:
+            try:
+                run['outcome'] = self._run_cycle(force, on_chunk, feeds, on_progress)
+            except LeaseLost:
+                run['outcome'] = 'lease_lost'
+                raise
+        return run['outcome']
+
+    @contextmanager
+    def _stage(self, name, on_progress=None):
+        self.check_lease()
+        if on_progress is not None:
+            on_progress(name)
+        with METRICS.timer('stage', stage=name):
+            yield
+
+    def _run_cycle(self, force, on_chunk, feeds, on_progress=None):
+        """Returns the outcome of the cycle: 'unchanged', 'no_articles' or 'completed'."""
+        logger.info("Starting pipeline run...")
+        if feeds is None:
+            feeds = self.load_feeds()
+        cutoff_time = self.cutoff_time()
+        
+        # Poll Feeds (sharded workers write to the store themselves and return the new articles)
+        with self._stage('poll', on_progress):
+            if self.sharded_poller:
+                new_articles = self.sharded_poller.poll(feeds, time_window_hours=self.time_window_hours)
+            else:
+                polled = self.poller.fetch_feeds(feeds, time_window_hours=self.time_window_hours)
+
+        # Record what is new and slide the window forward
+        with self._stage('store', on_progress):
+            if not self.sharded_poller:
+                new_articles = self.store.upsert(polled)
+            self.store.expire(cutoff_time)
+        METRICS.inc('articles_new', len(new_articles))
+
+        # Pending rather than new: articles stored by a run that failed later are still pending
+        if not self.store.pending() and not force and self.briefings.has_runs():
+            logger.info("No new articles since the last successful run, keeping the current briefing.")
+            return 'unchanged'
+
+        articles = self.store.recent(cutoff_time)
+        METRICS.set_gauge('window_articles', len(articles))
+        
+        if not articles:
+            logger.info("No articles found.")
+            return 'no_articles'
+
+        # Detect Trends
+        logger.info(f"Analyzing {len(articles)} articles ({len(new_articles)} new) for trends...")
+        with self._stage('cluster', on_progress):
+            clusters = self.detect_clusters(articles, cutoff_time)
+
+        targets = self.select_targets(clusters, articles)
+        with self._stage('briefings', on_progress):
+            briefings = self.build_briefings(targets, on_chunk)
+        with self._stage('save', on_progress):
+            self.save_output(briefings, articles)
+        return 'completed'
+
+    def run_pipelined(self, force=False, on_chunk=None, feeds=None):
+        """
+        Same cycle as run_pipeline, with stages overlapping: embedding starts as the first
+        feeds arrive and likely trends are scraped before clustering finishes. See src/pipeline.py.
+        """
+        from src.pipeline import Pipeline, PipelineCancelled
+        pipeline = Pipeline(self)
+        with self.exclusive(on_lost=pipeline.cancel), self.instrumented('pipelined') as run:
+            try:
+                run['outcome'] = pipeline.run(force=force, on_chunk=on_chunk, feeds=feeds)
+            except PipelineCancelled as e:
+                if self.lease_lost.is_set():
+                    run['outcome'] = 'lease_lost'
+                    raise LeaseLost("The run lease was lost, the run was aborted.") from e
+                run['outcome'] = 'cancelled'
+                raise
+            finally:
+                run['pipeline'] = pipeline.stats
+            return run['outcome']
+
+    def cutoff_time(self):
+        return datetime.now(timezone.utc) - timedelta(hours=self.time_window_hours)
+
+    def build_briefings(self, targets, on_chunk=None, prefetched=None):
+        """Scrape + synthesize each target, top-K targets run concurrently."""
+        indices = range(len(targets))
+        if len(targets) > 1:
+            with ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix="brief") as executor:
+                return list(executor.map(lambda t, i: self.build_briefing(t, i, on_chunk, prefetched), targets, indices))
+        return [self.build_briefing(t, i, on_chunk, prefetched) for t, i in zip(targets, indices)]
+
+    def save_output(self, briefings, articles):
+        """
+        Appends the briefings and the latest articles (the raw feed) to the briefing store,
+        then marks the window's articles as briefed.
+        """
+        self.briefings.save(briefings, articles[:FEED_LIMIT])
+        self.store.mark_briefed(articles)
+        logger.info(f"{len(briefings)} briefing(s) generated and saved.")
+
+    def detect_clusters(self, articles, cutoff_time):
+        """Returns [(cluster_id, articles)] using the detector's clustering mode."""
+        if self.detector.mode == 'incremental':
+            tracked = self.detector.update_clusters(articles, cutoff_time)
+            for c in tracked:
+                if c['size'] != c['previous_size']:
+                    logger.info(f"Trend {c['id']} grew from {c['previous_size']} to {c['size']} articles.")
+            return [(c['id'], c['articles']) for c in tracked]
+        # DBSCAN labels are not stable between runs, number clusters by rank instead
+        clusters = sorted(self.detector.detect_clusters(articles), key=len, reverse=True)
+        return list(enumerate(clusters))
+
+    def select_targets(self, clusters, articles):
+        """
+        Picks up to top_k clusters to brief on.
+        Returns a list of dicts with 'cluster_id', 'briefing_type' and 'articles'.
+        """
+        # Filter for significant clusters
+        # Priority 1: Trend (>5), Priority 2: Emerging (>2), Priority 3: Latest (Fallback)
+        significant_clusters = []
+        for cid, c in clusters:
+            if len(c) >= 5:
+                significant_clusters.append((cid, c))
+
+        emerging_clusters = []
+        for cid, c in clusters:
+            if 2 <= len(c) < 5:
+                emerging_clusters.append((cid, c))
+
+        candidates = []
+        for cid, c in sorted(significant_clusters, key=lambda x: len(x[1]), reverse=True):
+            candidates.append({"cluster_id": cid, "briefing_type": "Trending Narrative", "articles": c})
+        for cid, c in sorted(emerging_clusters, key=lambda x: len(x[1]), reverse=True):
+            candidates.append({"cluster_id": cid, "briefing_type": "Emerging Topic", "articles": c})
+        
+        if significant_clusters:
+            logger.info(f"Found {len(significant_clusters)} trends. Processing top {min(self.top_k, len(candidates))} topics.")
+        elif emerging_clusters:
+            logger.info(f"No major trends. Processing top emerging topics.")
+        else:
+            logger.info("No clusters found. Processing latest articles.")
+            return [{"cluster_id": None, "briefing_type": "Latest News Snapshot", "articles": articles[:5]}]
+
+        return candidates[:self.top_k]
+
+    @staticmethod
+    def source_urls(target_articles, limit=5):
+        """Unique article links of a target, in order, at most limit of them."""
+        urls = []
+        seen_links = set()
+        for a in target_articles:
+            link = a['link']
+            if link not in seen_links:
+                urls.append(link)
+                seen_links.add(link)
+        return urls[:limit]
+
+    def build_briefing(self, target, index=0, on_chunk=None, prefetched=None):
+        """
+        Scrapes the sources of one target and synthesizes its briefing, streaming it to on_chunk if given.
+        prefetched is an optional {url: text} map of pages scraped ahead of time.
+        """
+        target_articles = target["articles"]
+
+        # Scrape URLs
+        urls = self.source_urls(target_articles)
+        prefetched = prefetched or {}
+        missing = [url for url in urls if url not in prefetched]
+        scraped = self.scraper.scrape_urls(missing) if missing else {}
+        scrape_results = {url: prefetched[url] if url in prefetched else scraped[url] for url in urls
+                          if url in prefetched or url in scraped}
+        
+        # Synthesize
+        logger.info(f"Synthesizing briefing ({target['briefing_type']}, cluster {target['cluster_id']})...")
+        if on_chunk is None:
+            briefing_text = self.synthesizer.synthesize_briefing(scrape_results)
+        else:
+            parts = []
+            for chunk in self.synthesizer.stream_briefing(scrape_results):
+                parts.append(chunk)
+                on_chunk(index, chunk)
+            briefing_text = ''.join(parts)
+
+        return {
+            "cluster_id": target["cluster_id"],
+            "briefing_type": target["briefing_type"],
+            "briefing": briefing_text,
+            "sources": target_articles,
+            "trend_size": len(target_articles),
+        }
+
+    def start_loop(self, interval_minutes=15, pipelined=False):
+        """Runs the pipeline every interval_minutes on wall-clock ticks, see src/scheduler.py."""
+        from src.scheduler import Scheduler
+        try:
+            Scheduler(self, tick_minutes=interval_minutes, default_interval_minutes=interval_minutes,
+                      pipelined=pipelined).run_forever()
+        finally:
+            self.close()
+
+    def close(self):
+        """Shuts down the worker processes of sharded polling and page extraction, if started."""
+        if self.sharded_poller is not None:
+            self.sharded_poller.close()
+        self.scraper.close()
+
+if __name__ == "__main__":
+    # Set RSSAI_PROFILE=cprofile (or sample) to profile the run
+    orchestrator = Orchestrator()
+    orchestrator.run_pipeline()
@@ -0,0 +1,239 @@
+"""
+Stage-overlapping variant of Orchestrator.run_pipeline.
+Polling, embedding and speculative scraping run in their own threads connected by bounded
+queues, so embedding starts with the first feed that arrives and pages of clusters that are
+already large are scraped while the remaining feeds are still being polled and embedded.
+A full queue blocks its producer (backpressure) and cancel() stops every stage.
+"""
+import time
+import queue
+import logging
+import threading
+
+from src.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+class PipelineCancelled(Exception):
+    pass
+
+class Pipeline:
+    def __init__(self, orchestrator, queue_size=8, batch_size=64, scrape_workers=4, speculate_min_size=5):
+        self.orchestrator = orchestrator
+        # Feeds (lists of articles) waiting to be embedded / URLs waiting to be scraped
+        self.queue_size = queue_size
+        # Articles are embedded as they arrive, in micro-batches of at most batch_size
+        self.batch_size = batch_size
+        self.scrape_workers = scrape_workers
+        # Incremental clusters reaching this size are scraped before clustering finishes
+        self.speculate_min_size = speculate_min_size
+        self._cancel = threading.Event()
+        self._errors = []
+        self._error_lock = threading.Lock()
+        self.stats = {}
+
+    def cancel(self):
+        """Stops all stages, run() raises PipelineCancelled."""
+        self._cancel.set()
+
+    def run(self, force=False, on_chunk=None, feeds=None):
+        """
+        Runs one cycle, same semantics and arguments as Orchestrator.run_pipeline.
+        The caller is responsible for holding the orchestrator's run lease.
+        Returns the outcome: 'unchanged', 'no_articles' or 'completed'.
+        """
+        orch = self.orchestrator
+        started = time.monotonic()
+        self._cancel.clear()
+        self._errors = []
+        self.stats = {'feeds': 0, 'new_articles': 0, 'embedded': 0, 'speculative_scrapes': 0, 'prefetch_used': 0}
+        self._started = started
+        self._cutoff = orch.cutoff_time()
+        self._feeds = orch.load_feeds() if feeds is None else feeds
+        self._feed_queue = queue.Queue(maxsize=self.queue_size)
+        self._scrape_queue = queue.Queue(maxsize=self.queue_size)
+        self._queued_urls = set()
+        self._wanted = None
+        self.prefetched = {}
+        self._prefetch_lock = threading.Lock()
+
+        logger.info("Starting pipelined run...")
+        stages = [threading.Thread(target=self._guard, args=(self._poll_stage, 'poll'), name="pipe-poll", daemon=True),
+                  threading.Thread(target=self._guard, args=(self._embed_stage, 'embed'), name="pipe-embed", daemon=True)]
+        scrapers = [threading.Thread(target=self._guard, args=(self._scrape_stage, 'prefetch'), name=f"pipe-scrape-{i}",
+                                     daemon=True) for i in range(self.scrape_workers)]
+        for thread in stages + scrapers:
+            thread.start()
+
+        try:
+            self._join(stages)
+
+            articles = orch.store.recent(self._cutoff)
+            if not orch.store.pending() and not force and orch.briefings.has_runs():
+                logger.info("No new articles since the last successful run, keeping the current briefing.")
+                return 'unchanged'
+            METRICS.set_gauge('window_articles', len(articles))
+            if not articles:
+                logger.info("No articles found.")
+                return 'no_articles'
+
+            # Embeddings are cached (or already assigned to clusters) by now, this step is cheap
+            logger.info(f"Analyzing {len(articles)} articles ({self.stats['new_articles']} new) for trends...")
+            with METRICS.timer('stage', stage='cluster'):
+                clusters = orch.detect_clusters(articles, self._cutoff)
+            targets = orch.select_targets(clusters, articles)
+
+            # Let the scrapers finish pages that are needed, drop queued speculation that is not
+            self._wanted = {url for t in targets for url in orch.source_urls(t['articles'])}
+            for _ in scrapers:
+                self._put(self._scrape_queue, _DONE)
+            self._join(scrapers)
+
+            prefetched = {url: text for url, text in self.prefetched.items() if url in self._wanted}
+            self.stats['prefetch_used'] = len(prefetched)
+            logger.info(f"Pipeline: {len(prefetched)}/{len(self._wanted)} source pages scraped ahead of time.")
+            self._check_cancelled()
+            with METRICS.timer('stage', stage='briefings'):
+                briefings = orch.build_briefings(targets, on_chunk, prefetched)
+            # Nothing is saved once cancelled (the run may have lost its lease meanwhile)
+            self._check_cancelled()
+            with METRICS.timer('stage', stage='save'):
+                orch.save_output(briefings, articles)
+            return 'completed'
+        finally:
+            # Stops stages still running after an early return or an error
+            self._cancel.set()
+            self.stats['total_seconds'] = round(time.monotonic() - started, 3)
+            logger.info(f"Pipeline stats: {self.stats}")
+
+    def _check_cancelled(self):
+        if self._cancel.is_set():
+            raise PipelineCancelled("Pipeline run was cancelled.")
+
+    # --- stages -------------------------------------------------------------------------
+
+    def _poll_stage(self):
+        orch = self.orchestrator
+        sharded = orch.sharded_poller is not None
+        if sharded:
+            # Whole shards at a time, already upserted by the workers: only their new articles
+            polled = orch.sharded_poller.iter_polls(self._feeds, time_window_hours=orch.time_window_hours)
+        else:
+            polled = orch.poller.iter_feeds(self._feeds, time_window_hours=orch.time_window_hours)
+        try:
+            for feeds, articles in polled:
+                if self._cancel.is_set():
+                    break
+                self.stats['feeds'] += len(feeds) if sharded else 1
+                if not articles:
+                    continue
+                self.stats.setdefault('first_feed_seconds', round(time.monotonic() - self._started, 3))
+                # Only the new representatives go on: known articles are embedded already and
+                # near-duplicate copies are collapsed by the store, they must not be embedded or
+                # counted towards a trend
+                new_articles = articles if sharded else orch.store.upsert(articles)
+                self.stats['new_articles'] += len(new_articles)
+                METRICS.inc('articles_new', len(new_articles))
+                if new_articles and not self._put(self._feed_queue, new_articles):
+                    break
+        finally:
+            polled.close()
+            orch.store.expire(self._cutoff)
+            self._put(self._feed_queue, _DONE, force=True)
+
+    def _embed_stage(self):
+        detector = self.orchestrator.detector
+        while True:
+            item = self._get(self._feed_queue)
+            done = item is _DONE
+            batch = [] if done else list(item)
+            # Take whatever else has arrived meanwhile, up to batch_size articles
+            while not done and len(batch) < self.batch_size:
+                try:
+                    item = self._feed_queue.get_nowait()
+                except queue.Empty:
+                    break
+                done = item is _DONE
+                if not done:
+                    batch.extend(item)
+            if batch:
+                if detector.mode == 'incremental':
+                    detector.add_articles(batch)
+                    self._speculate(detector.clusterer.current_clusters(min_size=self.speculate_min_size))
+                else:
+                    # DBSCAN needs every vector before it can cluster, warm the embedding cache meanwhile
+                    detector.vectorize_texts([detector.headline(art) for art in batch])
+                self.stats['embedded'] += len(batch)
+            if done:
+                return
+
+    def _speculate(self, clusters):
+        """Queues the source pages of clusters that are already big enough to become a target."""
+        for cluster in clusters[:self.orchestrator.top_k]:
+            for url in self.orchestrator.source_urls(cluster['articles']):
+                if url in self._queued_urls:
+                    continue
+                self._queued_urls.add(url)
+                if not self._put(self._scrape_queue, url):
+                    return
+                self.stats['speculative_scrapes'] += 1
+
+    def _scrape_stage(self):
+        scraper = self.orchestrator.scraper
+        while True:
+            url = self._get(self._scrape_queue)
+            if url is _DONE:
+                return
+            if self._wanted is not None and url not in self._wanted:
+                continue
+            page = scraper.scrape_urls([url], concurrent=False)
+            if url in page:
+                with self._prefetch_lock:
+                    self.prefetched[url] = page[url]
+
+    # --- plumbing -----------------------------------------------------------------------
+
+    def _guard(self, stage, name):
+        """Runs a stage, a failure cancels the whole pipeline and is re-raised by run()."""
+        try:
+            with METRICS.timer('pipeline_stage', stage=name):
+                stage()
+        except Exception as e:
+            logger.error(f"Pipeline stage {threading.current_thread().name} failed: {e}")
+            with self._error_lock:
+                self._errors.append(e)
+            self._cancel.set()
+
+    def _put(self, q, item, force=False):
+        """Blocking put that gives up when the pipeline is cancelled. Returns False if cancelled."""
+        while force or not self._cancel.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                if force and self._cancel.is_set():
+                    return False
+        return False
+
+    def _get(self, q):
+        """Blocking get, returns _DONE when the pipeline is cancelled."""
+        while not self._cancel.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _join(self, threads):
+        """Waits for threads, stops waiting as soon as the pipeline is cancelled or fails."""
+        for thread in threads:
+            while thread.is_alive() and not self._cancel.is_set():
+                thread.join(timeout=0.1)
+        self._raise_if_failed()
+        self._check_cancelled()
+
+    def _raise_if_failed(self):
+        if self._errors:
+            raise self._errors[0]
@@ -0,0 +1,129 @@
+import math
+import logging
+from collections import Counter
+
+from src.shingling import words, shingles, MinHasher, MinHashLSH
+
+logger = logging.getLogger(__name__)
+
+class PromptBuilder:
+    """
+    Assembles the source context of a synthesis prompt within a total token budget.
+    1. Splits every source into paragraphs (the scraper emits one text block per line).
+    2. Drops paragraphs that are near-duplicates (MinHash Jaccard >= dedup_threshold) of a
+       paragraph already kept, which removes syndicated copy repeated across sources.
+    3. Splits the budget across sources in proportion to their relevance (cosine similarity
+       of their word counts with the whole cluster), giving unused share to the others.
+    4. Cuts each source at paragraph boundaries to fit its share.
+    """
+    def __init__(self, token_budget=8000, chars_per_token=4, dedup_threshold=0.8, min_paragraph_chars=60):
+        self.token_budget = token_budget
+        self.chars_per_token = chars_per_token
+        self.dedup_threshold = dedup_threshold
+        self.min_paragraph_chars = min_paragraph_chars
+        self.hasher = MinHasher()
+
+    def build_context(self, articles_content, token_budget=None):
+        """
+        Returns (context, stats) for a {url: text} map.
+        stats holds the character counts before/after dedup and budgeting and the number of
+        duplicate paragraphs removed.
+        """
+        budget_chars = (token_budget or self.token_budget) * self.chars_per_token
+        sources = {url: [p.strip() for p in text.splitlines() if p.strip()] for url, text in articles_content.items()}
+        original_chars = sum(len(text) for text in articles_content.values())
+
+        sources, duplicates = self._deduplicate(sources)
+        deduped_chars = sum(len(p) + 1 for paragraphs in sources.values() for p in paragraphs)
+
+        headers = {url: f"--- SOURCE {idx + 1} ({url}) ---\n" for idx, url in enumerate(sources)}
+        available = max(0, budget_chars - sum(len(h) + 2 for h in headers.values()))
+        shares = self._allocate(sources, available)
+
+        parts = []
+        for url, paragraphs in sources.items():
+            parts.append(headers[url])
+            parts.append(self._truncate(paragraphs, shares[url]))
+            parts.append("\n\n")
+        context = ''.join(parts)
+
+        stats = {
+            'original_chars': original_chars,
+            'deduped_chars': deduped_chars,
+            'final_chars': len(context),
+            'duplicate_paragraphs': duplicates,
+            'estimated_tokens': len(context) // self.chars_per_token,
+        }
+        return context, stats
+
+    def _deduplicate(self, sources):
+        lsh = MinHashLSH(self.hasher, threshold=self.dedup_threshold)
+        kept_sources = {}
+        duplicates = 0
+        for url, paragraphs in sources.items():
+            kept = []
+            for idx, paragraph in enumerate(paragraphs):
+                if len(paragraph) < self.min_paragraph_chars:
+                    # Short lines (bylines, captions) are cheap and too small to compare reliably
+                    kept.append(paragraph)
+                    continue
+                signature = self.hasher.signature(shingles(paragraph))
+                if lsh.query(signature):
+                    duplicates += 1
+                    continue
+                lsh.add((url, idx), signature)
+                kept.append(paragraph)
+            kept_sources[url] = kept
+        return kept_sources, duplicates
+
+    def _relevance(self, sources):
+        """Cosine similarity of each source's word counts with the cluster's total word counts."""
+        counts = {url: Counter(words(' '.join(paragraphs))) for url, paragraphs in sources.items()}
+        total = Counter()
+        for c in counts.values():
+            total.update(c)
+        total_norm = math.sqrt(sum(v * v for v in total.values())) or 1.0
+        scores = {}
+        for url, c in counts.items():
+            norm = math.sqrt(sum(v * v for v in c.values()))
+            dot = sum(v * total[w] for w, v in c.items())
+            scores[url] = dot / (norm * total_norm) if norm else 0.0
+        return scores
+
+    def _allocate(self, sources, available):
+        """Water-filling split of available chars by relevance, no source gets more than it has."""
+        sizes = {url: sum(len(p) + 1 for p in paragraphs) for url, paragraphs in sources.items()}
+        scores = self._relevance(sources)
+        shares = {url: 0 for url in sources}
+        open_urls = [url for url in sources if sizes[url] > 0]
+        remaining = available
+        while open_urls and remaining > 0:
+            total_score = sum(scores[url] for url in open_urls)
+            saturated = []
+            granted = 0
+            for url in open_urls:
+                fraction = scores[url] / total_score if total_score else 1.0 / len(open_urls)
+                grant = min(int(remaining * fraction), sizes[url] - shares[url])
+                shares[url] += grant
+                granted += grant
+                if shares[url] >= sizes[url]:
+                    saturated.append(url)
+            remaining -= granted
+            if not saturated:
+                break
+            open_urls = [url for url in open_urls if url not in saturated]
+        return shares
+
+    @staticmethod
+    def _truncate(paragraphs, max_chars):
+        """Joins paragraphs until max_chars is reached, cutting the last one if it alone would overflow."""
+        out = []
+        used = 0
+        for paragraph in paragraphs:
+            if used + len(paragraph) + 1 > max_chars:
+                if not out and max_chars > 0:
+                    out.append(paragraph[:max_chars])
+                break
+            out.append(paragraph)
+            used += len(paragraph) + 1
+        return '\n'.join(out)
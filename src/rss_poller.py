@@ -1,76 +1,217 @@
-import feedparser
-import datetime
-from datetime import timezone
-import time
-import logging
-
-logger = logging.getLogger(__name__)
-
-class RSSPoller:
-    def __init__(self):
-        pass
-
-    def fetch_feeds(self, feeds_list, time_window_hours=2.0):
-        """
-        Fetches articles from a list of RSS feeds.
-        Returns a list of articles published within the last time_window_hours.
-        """
-        articles = []
-        now = datetime.datetime.now(timezone.utc)
-        cutoff_time = now - datetime.timedelta(hours=time_window_hours)
-        
-        logger.info(f"Fetching {len(feeds_list)} feeds...")
-        
-        for feed_url in feeds_list:
-            try:
-                feed = feedparser.parse(feed_url)
-                if feed.bozo:
-                    logger.warning(f"Error parsing feed {feed_url}: {feed.bozo_exception}")
-                    continue
-                
-                source_title = feed.feed.get('title', feed_url)
-                
-                for entry in feed.entries:
-                    published_dt = self._parse_date(entry)
-                    
-                    if not published_dt:
-                        continue
-                        
-                    # Ensure timezone awareness for comparison
-                    if published_dt.tzinfo is None:
-                        published_dt = published_dt.replace(tzinfo=timezone.utc)
-                    
-                    if published_dt > cutoff_time:
-                        articles.append({
-                            'title': entry.get('title', ''),
-                            'link': entry.get('link', ''),
-                            'summary': entry.get('summary', ''),
-                            'published': published_dt.isoformat(),
-                            'source': source_title,
-                            'id': entry.get('id', entry.get('link', ''))
-                        })
-            except Exception as e:
-                logger.error(f"Failed to process feed {feed_url}: {e}")
-                
-        logger.info(f"Collected {len(articles)} articles from the last {time_window_hours} hours.")
-        return articles
-
-    def _parse_date(self, entry):
-        """Helper to parse date from feed entry"""
-        if 'published_parsed' in entry and entry.published_parsed:
-            return datetime.datetime.fromtimestamp(time.mktime(entry.published_parsed), timezone.utc)
-        elif 'updated_parsed' in entry and entry.updated_parsed:
-            return datetime.datetime.fromtimestamp(time.mktime(entry.updated_parsed), timezone.utc)
-        return None
-
-if __name__ == "__main__":
-    # Test run
-    import json
-    logging.basicConfig(level=logging.INFO)
-    with open('feeds.json', 'r') as f:
-        feeds = json.load(f)
-    
-    poller = RSSPoller()
-    recent = poller.fetch_feeds(feeds, time_window_hours=8.0) # Longer window for testing
-    for art in recent:
-        print(f"- [{art['source']}] {art['title']}")
+import datetime
+from datetime import timezone
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.concurrency import HostLimiter
+from src.feed_cache import FeedCache
+from src.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+def normalize_feeds(entries):
+    """
+    feeds.json lists feed URLs, or objects {"url": ..., "interval_minutes": ...} for feeds
+    polled on their own schedule. Returns every entry in the object form, interval_minutes
+    is None when not set.
+    """
+    feeds = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"url": entry}
+        feeds.append({"url": entry["url"], "interval_minutes": entry.get("interval_minutes")})
+    return feeds
+
+class RSSPoller:
+    def __init__(self, max_workers=16, per_host_limit=2, timeout=15, cache=None, use_cache=True):
+        # max_workers is the global in-flight limit, per_host_limit caps requests to a single host
+        # and timeout is the total time budget (in seconds) for downloading one feed.
+        self.max_workers = max_workers
+        # ETag / Last-Modified cache used for conditional GETs, disabled with use_cache=False
+        self.cache = cache if cache is not None else (FeedCache() if use_cache else None)
+        self.run_stats = {'hits': 0, 'misses': 0, 'bytes': 0}
+        self._stats_lock = threading.Lock()
+        self.timeout = timeout
+        self.host_limiter = HostLimiter(per_host_limit)
+        self.headers = {
+            'User-Agent': 'Mozilla/5.0 (compatible; RSSAIAgents/1.0; +https://github.com/anikdc/RSSAIAgents)'
+        }
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def fetch_feeds(self, feeds_list, time_window_hours=2.0, concurrent=True):
+        """
+        Fetches articles from a list of RSS feeds.
+        Returns a list of articles published within the last time_window_hours.
+        With concurrent=True feeds are downloaded and parsed on a thread pool, so the
+        total poll time tracks the slowest feed rather than the sum of all feeds.
+        """
+        articles = []
+        now = datetime.datetime.now(timezone.utc)
+        cutoff_time = now - datetime.timedelta(hours=time_window_hours)
+        
+        logger.info(f"Fetching {len(feeds_list)} feeds...")
+        started = time.monotonic()
+        self.run_stats = {'hits': 0, 'misses': 0, 'bytes': 0}
+
+        if concurrent and len(feeds_list) > 1:
+            workers = min(self.max_workers, len(feeds_list))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rss") as executor:
+                # map keeps the feeds.json order so results are deterministic
+                for feed_articles in executor.map(lambda url: self._fetch_feed(url, cutoff_time), feeds_list):
+                    articles.extend(feed_articles)
+        else:
+            for feed_url in feeds_list:
+                articles.extend(self._fetch_feed(feed_url, cutoff_time))
+                
+        logger.info(f"Collected {len(articles)} articles from the last {time_window_hours} hours "
+                    f"in {time.monotonic() - started:.2f}s.")
+        if self.cache:
+            self.cache.save()
+            logger.info(f"Feed cache: {self.run_stats['hits']} not modified, {self.run_stats['misses']} downloaded "
+                        f"({self.run_stats['bytes'] / 1024:.0f} KB).")
+        return articles
+
+    def iter_feeds(self, feeds_list, time_window_hours=2.0):
+        """
+        Streaming variant of fetch_feeds: yields (feed_url, articles) as soon as each
+        feed has been downloaded and parsed, in completion order.
+        """
+        now = datetime.datetime.now(timezone.utc)
+        cutoff_time = now - datetime.timedelta(hours=time_window_hours)
+        self.run_stats = {'hits': 0, 'misses': 0, 'bytes': 0}
+        if not feeds_list:
+            return
+
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(feeds_list)), thread_name_prefix="rss")
+        futures = {executor.submit(self._fetch_feed, url, cutoff_time): url for url in feeds_list}
+        try:
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            # A consumer that stops early (cancellation) does not wait for feeds still downloading
+            executor.shutdown(wait=False, cancel_futures=True)
+        if self.cache:
+            self.cache.save()
+
+    def _fetch_feed(self, feed_url, cutoff_time):
+        """
+        Downloads and parses a single feed. Never raises, failures are logged and yield no articles.
+        """
+        try:
+            cached = self.cache.get(feed_url) if self.cache else None
+            request_headers = dict(self.headers)
+            if cached and 'articles' in cached:
+                request_headers.update(self.cache.conditional_headers(feed_url))
+
+            with self.host_limiter.limit(feed_url), METRICS.timer('feed_fetch'):
+                status, content, headers = self._download(feed_url, request_headers)
+
+            if status == 304 and cached and 'articles' in cached:
+                # Not modified: reuse the articles extracted last time, no parsing needed
+                self.cache.record_hit(feed_url)
+                self._count('hits')
+                articles = cached['articles']
+            else:
+                # Imported here, a cycle whose feeds are all unchanged never parses one
+                import feedparser
+                self._count('misses')
+                self._count('bytes', len(content))
+                with METRICS.timer('feed_parse'):
+                    feed = feedparser.parse(content, response_headers=headers)
+                if feed.bozo:
+                    logger.warning(f"Error parsing feed {feed_url}: {feed.bozo_exception}")
+                    METRICS.inc('feed_errors')
+                    return []
+                articles = self._extract_articles(feed, feed_url)
+                if self.cache:
+                    self.cache.store(feed_url, headers.get('etag'), headers.get('last-modified'), articles)
+
+            recent = [a for a in articles if datetime.datetime.fromisoformat(a['published']) > cutoff_time]
+            METRICS.inc('feed_articles', len(recent))
+            return recent
+        except Exception as e:
+            logger.error(f"Failed to process feed {feed_url}: {e}")
+            METRICS.inc('feed_errors')
+            return []
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self.run_stats[key] += amount
+        if key == 'bytes':
+            METRICS.inc('feed_bytes', amount)
+        else:
+            METRICS.inc('cache_lookups', amount, cache='feed', result='hit' if key == 'hits' else 'miss')
+
+    def _download(self, feed_url, request_headers):
+        """
+        Fetches the raw feed body, enforcing self.timeout as a deadline for the whole download.
+        Returns (status_code, body, lower-cased response headers).
+        """
+        deadline = time.monotonic() + self.timeout
+        with self.session.get(feed_url, headers=request_headers, timeout=self.timeout, stream=True) as response:
+            if response.status_code == 304:
+                return 304, b'', {}
+            response.raise_for_status()
+            chunks = []
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                chunks.append(chunk)
+                if time.monotonic() > deadline:
+                    raise requests.Timeout(f"Download exceeded {self.timeout}s")
+            headers = {k.lower(): v for k, v in response.headers.items()}
+            headers['content-location'] = response.url
+            return response.status_code, b''.join(chunks), headers
+
+    def _extract_articles(self, feed, feed_url):
+        """
+        Turns parsed feed entries into article dicts.
+        All dated entries are kept so cached results can be re-filtered against later cutoffs.
+        """
+        articles = []
+        source_title = feed.feed.get('title', feed_url)
+        
+        for entry in feed.entries:
+            published_dt = self._parse_date(entry)
+            
+            if not published_dt:
+                continue
+                
+            # Ensure timezone awareness for comparison
+            if published_dt.tzinfo is None:
+                published_dt = published_dt.replace(tzinfo=timezone.utc)
+            
+            articles.append({
+                'title': entry.get('title', ''),
+                'link': entry.get('link', ''),
+                'summary': entry.get('summary', ''),
+                'published': published_dt.isoformat(),
+                'source': source_title,
+                'id': entry.get('id', entry.get('link', ''))
+            })
+        return articles
+
+    def _parse_date(self, entry):
+        """Helper to parse date from feed entry"""
+        if 'published_parsed' in entry and entry.published_parsed:
+            return datetime.datetime.fromtimestamp(time.mktime(entry.published_parsed), timezone.utc)
+        elif 'updated_parsed' in entry and entry.updated_parsed:
+            return datetime.datetime.fromtimestamp(time.mktime(entry.updated_parsed), timezone.utc)
+        return None
+
+if __name__ == "__main__":
+    # Test run
+    import json
+    logging.basicConfig(level=logging.INFO)
+    with open('feeds.json', 'r') as f:
+        feeds = [feed['url'] for feed in normalize_feeds(json.load(f))]
+    
+    poller = RSSPoller()
+    recent = poller.fetch_feeds(feeds, time_window_hours=8.0) # Longer window for testing
+    for art in recent:
+        print(f"- [{art['source']}] {art['title']}")
@@ -0,0 +1,86 @@
+import os
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_FILE = os.path.join(".cache", "lease.db")
+
+class RunInProgress(Exception):
+    """Raised when a pipeline run is requested while another process or thread holds the lease."""
+
+class LeaseLost(RunInProgress):
+    """Raised when a run could not renew its lease (it expired and may have been taken over)."""
+
+class RunLease:
+    """
+    Cross-process mutual exclusion for pipeline runs, stored in SQLite so it works the same
+    on every platform and from any process sharing the .cache directory (scheduler, app).
+    A lease expires ttl seconds after it was taken or last renewed, so a run that crashed
+    without releasing it does not block the next ones forever.
+    """
+    def __init__(self, path=DEFAULT_DB_FILE, name="pipeline", ttl=1800):
+        self.path = path
+        self.name = name
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit mode, transactions are opened explicitly with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS leases (
+                name TEXT PRIMARY KEY,
+                owner TEXT,
+                expires_at REAL
+            )
+        """)
+
+    def acquire(self):
+        """Takes the lease if it is free or expired. Returns True on success."""
+        now = time.time()
+        with self._lock:
+            # BEGIN IMMEDIATE takes SQLite's write lock, the check and the update are atomic
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute("SELECT owner, expires_at FROM leases WHERE name = ?", (self.name,)).fetchone()
+                # An active lease blocks everyone, including a second run through this instance
+                if row and row[1] > now:
+                    self.conn.execute("ROLLBACK")
+                    return False
+                if row and row[0] != self.owner:
+                    logger.warning(f"Taking over expired lease '{self.name}' from {row[0]}.")
+                self.conn.execute("INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)",
+                                  (self.name, self.owner, now + self.ttl))
+                self.conn.execute("COMMIT")
+                return True
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def renew(self):
+        """Extends a held lease by ttl seconds. Returns False if the lease was lost."""
+        with self._lock:
+            cursor = self.conn.execute("UPDATE leases SET expires_at = ? WHERE name = ? AND owner = ?",
+                                       (time.time() + self.ttl, self.name, self.owner))
+        return cursor.rowcount == 1
+
+    def release(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (self.name, self.owner))
+
+    def holder(self):
+        """Returns the owner of the active lease, or None."""
+        with self._lock:
+            row = self.conn.execute("SELECT owner, expires_at FROM leases WHERE name = ?", (self.name,)).fetchone()
+        return row[0] if row and row[1] > time.time() else None
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
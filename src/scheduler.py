@@ -0,0 +1,112 @@
+"""
+Long-running scheduler for the agent.
+Runs are aligned to wall-clock ticks (every tick_minutes since the epoch, e.g. :00, :05,
+:10 ...) instead of sleeping a fixed time after each run, so the period does not drift by
+the run time and ticks missed while a run overran are skipped rather than queued.
+Each feed has its own polling interval (interval_minutes in feeds.json, default
+default_interval_minutes) and is polled on the ticks where its interval boundary passed.
+One Orchestrator is kept for the life of the process, so HTTP sessions, model clients and
+caches stay warm between runs.
+"""
+import os
+import sys
+import time
+import math
+import logging
+import argparse
+import threading
+
+# Ensure the root of the project is in sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.orchestrator import Orchestrator
+from src.run_lease import RunInProgress
+from src.metrics import serve_prometheus
+
+logger = logging.getLogger("Scheduler")
+
+class Scheduler:
+    def __init__(self, orchestrator=None, tick_minutes=5, default_interval_minutes=15, pipelined=False):
+        self.orchestrator = orchestrator or Orchestrator()
+        self.tick_seconds = tick_minutes * 60
+        self.default_interval_minutes = default_interval_minutes
+        self.pipelined = pipelined
+        # url -> wall-clock time of the tick that last polled it
+        self.last_polled = {}
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def next_tick(self, now=None):
+        """Wall-clock time of the first tick strictly after now."""
+        now = time.time() if now is None else now
+        return (math.floor(now / self.tick_seconds) + 1) * self.tick_seconds
+
+    def due_feeds(self, tick):
+        """Feed URLs whose polling interval has a boundary between their last poll and tick."""
+        due = []
+        for feed in self.orchestrator.load_feed_config():
+            interval = (feed['interval_minutes'] or self.default_interval_minutes) * 60
+            last = self.last_polled.get(feed['url'])
+            if last is None or math.floor(tick / interval) > math.floor(last / interval):
+                due.append(feed['url'])
+        return due
+
+    def run_tick(self, tick):
+        """Polls the feeds due at tick. Returns False if another run held the lease."""
+        feeds = self.due_feeds(tick)
+        if not feeds:
+            return True
+        logger.info(f"Tick {time.strftime('%H:%M:%S', time.localtime(tick))}: polling {len(feeds)} feed(s).")
+        run = self.orchestrator.run_pipelined if self.pipelined else self.orchestrator.run_pipeline
+        try:
+            run(feeds=feeds)
+        except RunInProgress as e:
+            # The feeds stay due and are picked up by the next tick
+            logger.info(f"Skipping tick: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"Pipeline failed: {e}")
+        for url in feeds:
+            self.last_polled[url] = tick
+        return True
+
+    def run_forever(self):
+        logger.info(f"Scheduler started, ticks every {self.tick_seconds // 60} minutes.")
+        # First run right away, then on the tick grid
+        tick = time.time()
+        while not self._stop.is_set():
+            self.run_tick(tick)
+            tick = self.next_tick()
+            logger.info(f"Next tick at {time.strftime('%H:%M:%S', time.localtime(tick))}.")
+            if self._stop.wait(max(0.0, tick - time.time())):
+                break
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the agent on a wall-clock schedule.")
+    parser.add_argument("--tick-minutes", type=float, default=5)
+    parser.add_argument("--default-interval-minutes", type=float, default=15)
+    parser.add_argument("--cluster-mode", default="incremental", choices=["dbscan", "incremental"])
+    parser.add_argument("--top-k", type=int, default=1)
+    parser.add_argument("--pipelined", action="store_true")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve Prometheus metrics on this port (http://host:port/metrics)")
+    parser.add_argument("--metrics-host", default="127.0.0.1",
+                        help="Interface the metrics are served on (0.0.0.0: all interfaces)")
+    parser.add_argument("--profile", choices=["cprofile", "sample"], default=None,
+                        help="Profile every run, output goes to .cache/profiles/")
+    parser.add_argument("--shards", type=int, default=0,
+                        help="Poll and parse the feeds on this many worker processes (0: in this process)")
+    parser.add_argument("--extract-processes", type=int, default=0,
+                        help="Extract scraped pages on this many worker processes (0: in the scraping threads)")
+    args = parser.parse_args()
+    if args.metrics_port:
+        serve_prometheus(args.metrics_port, host=args.metrics_host)
+    orchestrator = Orchestrator(cluster_mode=args.cluster_mode, top_k=args.top_k, profile=args.profile,
+                                shards=args.shards, extract_processes=args.extract_processes)
+    try:
+        Scheduler(orchestrator, tick_minutes=args.tick_minutes,
+                  default_interval_minutes=args.default_interval_minutes, pipelined=args.pipelined).run_forever()
+    finally:
+        orchestrator.close()
@@ -0,0 +1,138 @@
+import os
+import time
+import sqlite3
+import threading
+import logging
+
+from src.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_FILE = os.path.join(".cache", "scrape_cache.db")
+
+# stats key -> cache_lookups result label, 304 revalidations serve the page from the cache too
+_LOOKUP_RESULTS = {'hits': 'hit', 'revalidated': 'hit', 'negative_hits': 'negative_hit', 'misses': 'miss'}
+
+class ScrapeCache:
+    """
+    Disk-backed cache of scraped pages keyed by URL.
+    Stores the extracted text, HTTP status, validators (ETag / Last-Modified) and fetch time.
+    - Successful pages are fresh for ttl seconds, after that they are revalidated with a
+      conditional GET.
+    - Failures (non-200 status, or status 0 for network errors) are cached for negative_ttl
+      seconds so known-broken URLs are not retried every cycle.
+    - A transient failure (network error, 429 or 5xx) never replaces a cached page: the page
+      is kept and marked failed_at, and served without a retry for negative_ttl seconds.
+    - The total size of cached text is kept under max_bytes by evicting least recently used pages.
+    """
+    def __init__(self, path=DEFAULT_DB_FILE, ttl=6 * 3600, negative_ttl=1800, max_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                text TEXT,
+                status INTEGER,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL,
+                last_access REAL,
+                size INTEGER
+            )
+        """)
+        # Added to caches created before transient failures were kept apart from the pages
+        existing = {row['name'] for row in self.conn.execute("PRAGMA table_info(pages)")}
+        if 'failed_at' not in existing:
+            self.conn.execute("ALTER TABLE pages ADD COLUMN failed_at REAL")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_last_access ON pages(last_access)")
+        self.conn.commit()
+        self.stats = {'hits': 0, 'negative_hits': 0, 'revalidated': 0, 'misses': 0}
+
+    def get(self, url):
+        """Returns the cached entry for url as a dict, or None."""
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM pages WHERE url = ?", (url,)).fetchone()
+            if row:
+                with self.conn:
+                    self.conn.execute("UPDATE pages SET last_access = ? WHERE url = ?", (time.time(), url))
+        return dict(row) if row else None
+
+    def is_fresh(self, entry):
+        now = time.time()
+        if entry['status'] == 200 and entry.get('failed_at') and now - entry['failed_at'] < self.negative_ttl:
+            # Revalidation failed recently, keep serving the cached page meanwhile
+            return True
+        ttl = self.ttl if entry['status'] == 200 else self.negative_ttl
+        return now - entry['fetched_at'] < ttl
+
+    @staticmethod
+    def is_transient(status):
+        """Whether a failure status is worth retrying later: network errors, 429 and 5xx."""
+        return status == 0 or status == 429 or status >= 500
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry and entry['status'] == 200:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def record(self, kind):
+        with self._lock:
+            self.stats[kind] += 1
+        METRICS.inc('cache_lookups', cache='scrape', result=_LOOKUP_RESULTS[kind])
+
+    def store(self, url, text, status, etag=None, last_modified=None):
+        """
+        Saves a fetch result. text is None for failures.
+        A transient failure of a URL whose page is cached only marks the page failed_at.
+        """
+        now = time.time()
+        size = len(text.encode('utf-8')) if text else 0
+        with self._lock, self.conn:
+            if text is None and self.is_transient(status):
+                kept = self.conn.execute(
+                    "UPDATE pages SET failed_at = ?, last_access = ? WHERE url = ? AND status = 200",
+                    (now, now, url)).rowcount
+                if kept:
+                    return
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pages (url, text, status, etag, last_modified, fetched_at, last_access, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, text, status, etag, last_modified, now, now, size))
+            self._evict()
+
+    def touch(self, url):
+        """Marks a cached page as fresh again after a 304 Not Modified."""
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute("UPDATE pages SET fetched_at = ?, last_access = ?, failed_at = NULL WHERE url = ?",
+                              (now, now, url))
+
+    def _evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for url, size in self.conn.execute("SELECT url, size FROM pages ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            self.conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+            total -= size
+            evicted += 1
+        logger.info(f"Scrape cache: evicted {evicted} pages.")
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
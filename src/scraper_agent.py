@@ -1,73 +1,213 @@
-import requests
-from bs4 import BeautifulSoup
-import logging
-import re
-
-logger = logging.getLogger(__name__)
-
-class ScraperAgent:
-    def __init__(self):
-        self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-
-    def scrape_urls(self, urls):
-        """
-        Visits a list of URLs and scrapes their content.
-        Returns a map of URL -> Cleaned Text.
-        """
-        results = {}
-        for url in urls:
-            try:
-                logger.info(f"Scraping {url}...")
-                response = requests.get(url, headers=self.headers, timeout=10)
-                if response.status_code == 200:
-                    text = self._extract_content(response.text)
-                    results[url] = text
-                else:
-                    logger.warning(f"Failed to fetch {url}: Status {response.status_code}")
-            except Exception as e:
-                logger.error(f"Error scraping {url}: {e}")
-                
-        return results
-
-    def _extract_content(self, html):
-        """
-        Basic boilerplate removal using BeautifulSoup.
-        """
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style", "nav", "footer", "header", "aside"]):
-            script.decompose()
-
-        # Get text
-        text = soup.get_text(separator=' ')
-        
-        # Break into lines and remove leading/trailing space on each
-        lines = []
-        for line in text.splitlines():
-            lines.append(line.strip())
-        # Break multi-headlines into a line each
-        chunks = []
-        for line in lines:
-            for phrase in line.split("  "):
-                chunks.append(phrase.strip())
-        # Drop blank lines
-        final_chunks = []
-        for chunk in chunks:
-            if chunk:
-                final_chunks.append(chunk)
-        text = '\n'.join(final_chunks)
-        
-        # Limit to reasonable length (e.g., 5000 chars) to fit context window if needed, 
-        # though Gemini can handle large context.
-        return text[:10000]
-
-if __name__ == "__main__":
-    logging.basicConfig(level=logging.INFO)
-    scraper = ScraperAgent()
-    # Test with a known URL
-    test_url = "https://www.example.com"
-    content = scraper.scrape_urls([test_url])
-    print(content)
+import requests
+from requests.adapters import HTTPAdapter
+import logging
+import re
+import time
+import threading
+import multiprocessing
+from email.message import Message
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait
+
+from src.concurrency import HostLimiter
+from src.extractors import BaseExtractor, get_extractor
+from src.scrape_cache import ScrapeCache
+from src.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+
+def _extract(extractor, html, max_chars, charset):
+    """Runs in an extraction worker process. The page is fed in slices, parsing stops at max_chars."""
+    chunks = (html[i:i + 64 * 1024] for i in range(0, len(html), 64 * 1024))
+    return extractor.extract_chunks(chunks, max_chars, charset)
+
+class ScraperAgent:
+    def __init__(self, max_workers=8, per_domain_limit=2, timeout=10, deadline=30, extractor='lxml', max_chars=10000,
+                 cache=None, use_cache=True, max_bytes=2 * 1024 * 1024, extract_processes=0):
+        self.headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+        }
+        # timeout applies to each request, deadline (seconds) to a whole scrape_urls call
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.deadline = deadline
+        self.host_limiter = HostLimiter(per_domain_limit)
+        # Text extraction engine, an extractor name ('lxml', 'soup') or a BaseExtractor instance.
+        # Output is limited to max_chars to fit the synthesis context.
+        self.extractor = extractor if isinstance(extractor, BaseExtractor) else get_extractor(extractor)
+        self.max_chars = max_chars
+        # Pages are streamed and at most max_bytes of each body are read
+        self.max_bytes = max_bytes
+        # With extract_processes > 0 pages are parsed on that many worker processes instead of
+        # the scraping threads, so extraction of many pages is not serialized by the GIL
+        self.extract_processes = extract_processes
+        self._extract_pool = None
+        self._pool_lock = threading.Lock()
+        # Remembers extracted pages (and failures) across cycles, disabled with use_cache=False
+        self.cache = cache if cache is not None else (ScrapeCache() if use_cache else None)
+        # One pooled session so repeated hits on a publisher reuse connections
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def scrape_urls(self, urls, concurrent=True, deadline=None):
+        """
+        Visits a list of URLs and scrapes their content.
+        Returns a map of URL -> Cleaned Text.
+        Pages are fetched in parallel (at most per_domain_limit per publisher). Pages not
+        finished when the deadline hits are dropped and the partial results are returned.
+        """
+        deadline = self.deadline if deadline is None else deadline
+        started = time.monotonic()
+        texts = {}
+
+        if concurrent and len(urls) > 1:
+            executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(urls)), thread_name_prefix="scrape")
+            futures = {executor.submit(self._scrape_url, url): url for url in urls}
+            done, pending = wait(futures, timeout=deadline)
+            for future in done:
+                texts[futures[future]] = future.result()
+            if pending:
+                logger.warning(f"Scrape deadline of {deadline}s hit, dropping {len(pending)} unfinished pages.")
+            # Don't wait for stragglers, they finish (or time out) in the background
+            executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            for url in urls:
+                if deadline and time.monotonic() - started > deadline:
+                    logger.warning(f"Scrape deadline of {deadline}s hit, skipping remaining pages.")
+                    break
+                texts[url] = self._scrape_url(url)
+
+        # Keep the input order
+        results = {url: texts[url] for url in urls if texts.get(url) is not None}
+        logger.info(f"Scraped {len(results)}/{len(urls)} pages in {time.monotonic() - started:.2f}s.")
+        if self.cache:
+            logger.info(f"Scrape cache: {self.cache.stats}")
+        return results
+
+    def _scrape_url(self, url):
+        """
+        Fetches and extracts one page. Returns None on failure.
+        Fresh cache entries are returned without a request, stale ones are revalidated.
+        """
+        entry = self.cache.get(url) if self.cache else None
+        if entry and self.cache.is_fresh(entry):
+            if entry['status'] == 200:
+                self.cache.record('hits')
+                return entry['text']
+            self.cache.record('negative_hits')
+            logger.info(f"Skipping {url}, failed recently (status {entry['status']}).")
+            return None
+
+        headers = dict(self.headers)
+        if self.cache:
+            headers.update(self.cache.conditional_headers(entry))
+        try:
+            logger.info(f"Scraping {url}...")
+            with self.host_limiter.limit(url), METRICS.timer('scrape_page'), \
+                    self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+                if response.status_code == 304 and entry:
+                    self.cache.touch(url)
+                    self.cache.record('revalidated')
+                    return entry['text']
+                if self.cache:
+                    self.cache.record('misses')
+                if response.status_code == 200:
+                    content_type, charset = self._content_type(response)
+                    if content_type not in HTML_CONTENT_TYPES:
+                        # PDFs, images, videos... linked from feeds: don't download them
+                        logger.warning(f"Skipping {url}: content type {content_type}")
+                        if self.cache:
+                            self.cache.store(url, None, 415)
+                        return None
+                    with METRICS.timer('extract', extractor=self.extractor.name):
+                        text = self._extract_page(response, charset)
+                    METRICS.inc('scraped_pages', result='ok')
+                    if self.cache:
+                        self.cache.store(url, text, 200, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+                    return text
+                logger.warning(f"Failed to fetch {url}: Status {response.status_code}")
+                METRICS.inc('scraped_pages', result='error')
+                return self._store_failure(url, entry, response.status_code)
+        except Exception as e:
+            logger.error(f"Error scraping {url}: {e}")
+            METRICS.inc('scraped_pages', result='error')
+            # Status 0 marks network errors
+            return self._store_failure(url, entry, 0)
+        return None
+
+    def _store_failure(self, url, entry, status):
+        """
+        Caches a failed fetch. Returns the cached page if the failure is transient and the page
+        was cached (the cache keeps it), else None.
+        """
+        if not self.cache:
+            return None
+        self.cache.store(url, None, status)
+        if entry and entry['status'] == 200 and self.cache.is_transient(status):
+            logger.info(f"Using the cached copy of {url}.")
+            return entry['text']
+        return None
+
+    @staticmethod
+    def _content_type(response):
+        """Returns (media type, declared charset or None) of a response."""
+        header = response.headers.get('Content-Type')
+        if not header:
+            # No header at all, assume HTML and let the parser sniff the encoding
+            return 'text/html', None
+        message = Message()
+        message['Content-Type'] = header
+        return message.get_content_type(), message.get_content_charset()
+
+    def _read_limited(self, response):
+        """Yields the body in chunks, stopping once max_bytes have been read."""
+        remaining = self.max_bytes
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            if len(chunk) >= remaining:
+                METRICS.inc('scrape_bytes', remaining)
+                yield chunk[:remaining]
+                logger.info(f"Truncated {response.url} at {self.max_bytes} bytes.")
+                return
+            remaining -= len(chunk)
+            METRICS.inc('scrape_bytes', len(chunk))
+            yield chunk
+
+    def _extract_page(self, response, charset):
+        """Extracts the text of a response, on the extraction process pool if there is one."""
+        if not self.extract_processes:
+            return self.extractor.extract_chunks(self._read_limited(response), self.max_chars, charset)
+        html = b''.join(self._read_limited(response))
+        return self.extract_pool.submit(_extract, self.extractor, html, self.max_chars, charset).result()
+
+    @property
+    def extract_pool(self):
+        with self._pool_lock:
+            if self._extract_pool is None:
+                # spawn: the scraping threads make forking unsafe
+                self._extract_pool = ProcessPoolExecutor(max_workers=self.extract_processes,
+                                                         mp_context=multiprocessing.get_context('spawn'))
+            return self._extract_pool
+
+    def close(self):
+        """Shuts down the extraction processes, if started. They are restarted on the next use."""
+        with self._pool_lock:
+            if self._extract_pool is not None:
+                self._extract_pool.shutdown(wait=True, cancel_futures=True)
+                self._extract_pool = None
+
+    def _extract_content(self, html):
+        """
+        Boilerplate removal, delegated to the configured extractor.
+        """
+        return self.extractor.extract(html, self.max_chars)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    scraper = ScraperAgent()
+    # Test with a known URL
+    test_url = "https://www.example.com"
+    content = scraper.scrape_urls([test_url])
+    print(content)
@@ -0,0 +1,141 @@
+"""
+Sharded polling for very large feed lists.
+Feed parsing is CPU-bound and holds the GIL, so one process stops scaling at a few cores'
+worth of feeds. ShardedPoller partitions the feeds by host across a pool of worker
+processes: every worker downloads and parses its shard with its own RSSPoller and writes
+the articles into the shared ArticleStore (SQLite in WAL mode, writers take turns on its
+write lock), which is where the shards are merged. The parent only receives the articles
+that are new and each worker's metrics. Only polling is sharded: embedding stays in the
+parent process, it waits on the embedding API and shares its cache and rate limiter.
+
+    poller = ShardedPoller(shards=8)
+    new_articles = poller.poll(feed_urls, time_window_hours=24)
+"""
+import os
+import zlib
+import time
+import logging
+import multiprocessing
+from urllib.parse import urlsplit
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# Per-process state of the workers: one poller per shard and one store connection
+_pollers = {}
+_stores = {}
+_adapter = None
+
+def shard_of(feed_url, shards):
+    """Shard of a feed. Feeds of one host share a shard, so its per-host limit still holds."""
+    host = (urlsplit(feed_url).hostname or '').lower()
+    return zlib.crc32(host.encode('utf-8')) % shards
+
+def shard_feeds(feeds, shards):
+    """Partitions feed URLs into shards lists, stable across runs and processes."""
+    partition = [[] for _ in range(shards)]
+    for url in feeds:
+        partition[shard_of(url, shards)].append(url)
+    return partition
+
+def _init_worker(level, adapter):
+    global _adapter
+    _adapter = adapter
+    logging.basicConfig(level=level, format='%(asctime)s - %(processName)s - %(name)s - %(levelname)s - %(message)s')
+
+def _poll_shard(shard, shards, feeds, time_window_hours, store_path, use_cache):
+    """
+    Runs in a worker process: polls one shard and upserts it into the shared store.
+    Returns (shard, the new articles, metrics recorded meanwhile).
+    """
+    from src.rss_poller import RSSPoller
+    from src.feed_cache import HostFeedCache
+    from src.article_store import ArticleStore
+
+    METRICS.reset()
+    key = (shard, shards)
+    if key not in _pollers:
+        _pollers[key] = RSSPoller(use_cache=False)
+        if _adapter is not None:
+            _pollers[key].session.mount('http://', _adapter)
+            _pollers[key].session.mount('https://', _adapter)
+    poller = _pollers[key]
+    # One feed cache file per host, so the files do not depend on the number of shards. The
+    # pool hands a shard to whichever worker is free, so they are reloaded for every task: a
+    # copy kept in memory would be stale after another worker polled the shard, and saving it
+    # would drop that worker's validators
+    poller.cache = HostFeedCache() if use_cache else None
+    if store_path not in _stores:
+        _stores[store_path] = ArticleStore(store_path)
+    articles = poller.fetch_feeds(feeds, time_window_hours=time_window_hours)
+    new_articles = _stores[store_path].upsert(articles)
+    return shard, new_articles, METRICS.snapshot()
+
+class ShardedPoller:
+    """
+    Polls feeds on shards worker processes (default: one per core) into the ArticleStore at
+    store_path. The pool is started on first use and kept across cycles, so the workers keep
+    their HTTP sessions and store connections warm.
+    adapter, if given, is a (picklable) requests transport adapter mounted on the workers'
+    sessions, e.g. src.fake_backends.FakeHTTPAdapter to poll offline.
+    """
+    def __init__(self, shards=None, store_path=None, use_cache=True, adapter=None):
+        from src.article_store import DEFAULT_DB_FILE
+        self.shards = shards or os.cpu_count() or 1
+        # Absolute, the workers must open the same file as the parent
+        self.store_path = os.path.abspath(store_path or DEFAULT_DB_FILE)
+        self.use_cache = use_cache
+        self.adapter = adapter
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            # spawn: forking a process that runs threads (scheduler, app, metrics server) is unsafe
+            self._executor = ProcessPoolExecutor(max_workers=self.shards,
+                                                 mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=_init_worker, initargs=(logging.getLogger().level, self.adapter))
+        return self._executor
+
+    def iter_polls(self, feeds, time_window_hours=2.0):
+        """
+        Yields (feed URLs of the shard, new articles) as each shard finishes, in completion order.
+        The articles are already in the store. A failed shard is logged and yields no articles.
+        """
+        started = time.monotonic()
+        partition = [(shard, urls) for shard, urls in enumerate(shard_feeds(feeds, self.shards)) if urls]
+        logger.info(f"Polling {len(feeds)} feeds in {len(partition)} shards...")
+        futures = {self.executor.submit(_poll_shard, shard, self.shards, urls, time_window_hours, self.store_path,
+                                        self.use_cache): urls for shard, urls in partition}
+        try:
+            for future in as_completed(futures):
+                urls = futures[future]
+                try:
+                    shard, new_articles, metrics = future.result()
+                except Exception as e:
+                    logger.error(f"Shard of {len(urls)} feeds failed: {e}")
+                    METRICS.inc('shard_errors')
+                    yield urls, []
+                    continue
+                METRICS.merge(metrics)
+                logger.info(f"Shard {shard}: {len(urls)} feeds, {len(new_articles)} new articles "
+                            f"({time.monotonic() - started:.2f}s).")
+                yield urls, new_articles
+        finally:
+            # A consumer that stops early does not wait for shards that have not started
+            for future in futures:
+                future.cancel()
+
+    def poll(self, feeds, time_window_hours=2.0):
+        """Polls every shard and returns the new articles, in shard completion order."""
+        new_articles = []
+        for _, articles in self.iter_polls(feeds, time_window_hours):
+            new_articles.extend(articles)
+        return new_articles
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,110 @@
+"""
+Text fingerprinting helpers for near-duplicate detection: word shingles, MinHash
+signatures and LSH banding to find candidate pairs without comparing everything,
+and 64-bit SimHash fingerprints for short texts such as headlines.
+"""
+import re
+import zlib
+from collections import Counter
+from functools import lru_cache
+import numpy as np
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_MERSENNE_PRIME = (1 << 61) - 1
+
+def words(text):
+    return _WORD.findall(text.lower())
+
+def shingles(text, k=5):
+    """Set of hashed k-word shingles of text. Texts shorter than k words give one shingle."""
+    tokens = words(text)
+    if not tokens:
+        return set()
+    if len(tokens) <= k:
+        return {zlib.crc32(' '.join(tokens).encode('utf-8'))}
+    return {zlib.crc32(' '.join(tokens[i:i + k]).encode('utf-8')) for i in range(len(tokens) - k + 1)}
+
+@lru_cache(maxsize=1 << 16)
+def _word_hash(word):
+    # 64 bits from two CRC32s with different seeds, cached as headlines reuse most words
+    encoded = word.encode('utf-8')
+    return (zlib.crc32(encoded, 0x9E3779B9) << 32) | zlib.crc32(encoded)
+
+def simhash(text):
+    """
+    64-bit SimHash of the words of text: each word votes on every bit with its hash, weighted
+    by its count. Texts that share most of their words get fingerprints a few bits apart.
+    """
+    counts = Counter(words(text))
+    if not counts:
+        return 0
+    hashes = np.fromiter(map(_word_hash, counts), dtype=np.uint64, count=len(counts))
+    weights = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+    votes = weights @ (2 * bits.astype(np.int64) - 1)
+    return int(np.packbits(votes > 0, bitorder='little').view('<u8')[0])
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+def simhash_bands(fingerprint, bands=4):
+    """
+    Splits a fingerprint into equal bit bands. Two fingerprints within bands - 1 bits of
+    each other share at least one band (pigeonhole), so bands work as exact-match lookup keys.
+    """
+    width = 64 // bands
+    mask = (1 << width) - 1
+    return [(fingerprint >> (band * width)) & mask for band in range(bands)]
+
+class MinHasher:
+    """
+    MinHash signatures over shingle sets, the share of equal signature slots estimates
+    the Jaccard similarity of two sets.
+    """
+    def __init__(self, num_perm=64, seed=1):
+        rng = np.random.default_rng(seed)
+        # a * x stays below 2**63 for 32-bit shingle hashes, so uint64 arithmetic is exact
+        self.a = rng.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 31, size=num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+
+    def signature(self, shingle_set):
+        if not shingle_set:
+            return np.full(self.num_perm, np.iinfo(np.uint64).max, dtype=np.uint64)
+        x = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set))
+        hashed = (np.outer(x, self.a) + self.b) % _MERSENNE_PRIME
+        return hashed.min(axis=0)
+
+    @staticmethod
+    def similarity(sig_a, sig_b):
+        return float(np.mean(sig_a == sig_b))
+
+class MinHashLSH:
+    """
+    Banded LSH index over MinHash signatures. query() returns previously added keys that
+    share at least one band and whose estimated Jaccard similarity reaches threshold.
+    """
+    def __init__(self, hasher, threshold=0.8, bands=16):
+        if hasher.num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.hasher = hasher
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = hasher.num_perm // bands
+        self._buckets = [{} for _ in range(bands)]
+        self._signatures = {}
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def query(self, signature):
+        candidates = set()
+        for band, key in self._band_keys(signature):
+            candidates.update(self._buckets[band].get(key, ()))
+        return [c for c in candidates if MinHasher.similarity(signature, self._signatures[c]) >= self.threshold]
+
+    def add(self, key, signature):
+        self._signatures[key] = signature
+        for band, band_key in self._band_keys(signature):
+            self._buckets[band].setdefault(band_key, []).append(key)
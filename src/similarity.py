@@ -0,0 +1,60 @@
+"""
+Shared cosine similarity core.
+Embeddings are converted once into a contiguous, L2-normalized float32 matrix, after which
+cosine distance is 1 - X @ X.T. Distances are computed in row blocks so memory stays
+bounded (block_size x n) no matter how many articles are in the window.
+"""
+import numpy as np
+
+DEFAULT_BLOCK_SIZE = 2048
+
+def to_unit_matrix(vectors):
+    """Converts a list/array of embeddings into a C-contiguous, L2-normalized float32 matrix."""
+    X = np.array(vectors, dtype=np.float32, order='C', copy=True)
+    if X.ndim == 1:
+        X = X[None, :]
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    X /= norms
+    return X
+
+def iter_distance_blocks(X, Y=None, block_size=DEFAULT_BLOCK_SIZE):
+    """Yields (row_start, block) with the cosine distances of X[row_start:row_start + block_size] to Y (default X)."""
+    Y = X if Y is None else Y
+    for start in range(0, len(X), block_size):
+        block = X[start:start + block_size] @ Y.T
+        np.subtract(1.0, block, out=block)
+        yield start, block
+
+def pairwise_cosine_distances(X, block_size=DEFAULT_BLOCK_SIZE):
+    """Dense n x n cosine distance matrix. Only meant for small n (debugging)."""
+    D = np.empty((len(X), len(X)), dtype=np.float32)
+    for start, block in iter_distance_blocks(X, block_size=block_size):
+        D[start:start + len(block)] = block
+    np.maximum(D, 0.0, out=D)
+    return D
+
+def neighbor_graph(rows, cols, dists, n):
+    """
+    Builds a symmetric sparse distance graph for DBSCAN(metric='precomputed').
+    Distances are floored at a tiny positive value: exact duplicates (distance 0) would
+    otherwise be stored as explicit zeros, which sparse operations may drop.
+    """
+    # Imported here, scipy is only needed once DBSCAN runs
+    from scipy import sparse
+    if not rows:
+        return sparse.csr_matrix((n, n), dtype=np.float32)
+    data = np.maximum(np.concatenate(dists), 1e-8)
+    graph = sparse.csr_matrix((data, (np.concatenate(rows), np.concatenate(cols))), shape=(n, n))
+    # Keep a pair if either side found it
+    return graph.maximum(graph.T).tocsr()
+
+def radius_neighbors_graph(X, eps, block_size=DEFAULT_BLOCK_SIZE):
+    """Exact sparse graph of all pairs within cosine distance eps, computed block by block."""
+    rows, cols, dists = [], [], []
+    for start, block in iter_distance_blocks(X, block_size=block_size):
+        r, c = np.nonzero(block <= eps)
+        rows.append(r + start)
+        cols.append(c)
+        dists.append(block[r, c])
+    return neighbor_graph(rows, cols, dists, len(X))
@@ -1,50 +1,182 @@
-import os
-import google.generativeai as genai
-import logging
-from dotenv import load_dotenv
-
-load_dotenv()
-logger = logging.getLogger(__name__)
-
-class SynthesisAgent:
-    def __init__(self, api_key=None):
-        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
-            logger.warning("GEMINI_API_KEY not found. Synthesis will fail.")
-        else:
-            genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel('gemini-2.5-flash') # Standard model
-
-    def synthesize_briefing(self, articles_content):
-        """
-        Synthesizes a briefing from a list of article texts.
-        articles_content: List of strings (article texts) or Dict {source: text}
-        """
-        if not articles_content:
-            return "No content to synthesize."
-
-        # Prepare context
-        context = ""
-        for idx, (url, text) in enumerate(articles_content.items()):
-            context += f"--- SOURCE {idx+1} ({url}) ---\n{text[:8000]}\n\n"
-
-        prompt = (
-            "You are an expert news analyst. "
-            "Synthesize these articles into a single coherent narrative briefing. "
-            "Highlight discrepancies between sources if any. "
-            "Focus on the facts and the bigger picture. "
-            "Format nicely in Markdown."
-            "\n\n"
-            f"{context}"
-        )
-
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            logger.error(f"Error during synthesis: {e}")
-            return "Error generating briefing."
-
-if __name__ == "__main__":
-    agent = SynthesisAgent()
-    # Mock data would go here
+import time
+import threading
+import logging
+
+from src import clients
+from src.concurrency import TokenBucket
+from src.synthesis_cache import SynthesisCache, content_hashes, fingerprint
+from src.prompt_builder import PromptBuilder
+from src.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+class SynthesisAgent:
+    def __init__(self, api_key=None, model=None, max_concurrent=4, requests_per_minute=10,
+                 cache=None, use_cache=True, delta_max_changed=2, token_budget=8000):
+        # model replaces the Gemini model, e.g. src.fake_backends.FakeGenerativeModel for offline runs
+        self.api_key = clients.api_key(api_key)
+        self.model_name = 'gemini-2.5-flash' # Standard model
+        # The Gemini model is created from the shared client registry on first use
+        self._model = model
+        if model is None and not self.api_key:
+            logger.warning("GEMINI_API_KEY not found. Synthesis will fail.")
+
+        # Budget shared by every briefing generated concurrently through this agent
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self.rate_limiter = TokenBucket(requests_per_minute / 60.0, capacity=max_concurrent)
+
+        # Briefings are reused while a cluster's sources are unchanged. When at most
+        # delta_max_changed sources differ, the previous briefing is updated instead of
+        # regenerated (0 disables delta updates).
+        self.cache = cache if cache is not None else (SynthesisCache() if use_cache else None)
+        self.delta_max_changed = delta_max_changed
+
+        # Source context is deduplicated and fitted into token_budget
+        self.prompt_builder = PromptBuilder(token_budget=token_budget)
+        self.last_prompt_stats = {}
+
+    @property
+    def model(self):
+        if self._model is None and self.api_key:
+            self._model = clients.generative_model(self.model_name, self.api_key)
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        self._model = model
+
+    def synthesize_briefing(self, articles_content):
+        """
+        Synthesizes a briefing from a list of article texts.
+        articles_content: List of strings (article texts) or Dict {source: text}
+        Safe to call from several threads, calls share the concurrency and rate budget.
+        """
+        if not articles_content:
+            return "No content to synthesize."
+
+        hashes, fp, cached, prompt, depth = self._prepare(articles_content)
+        if cached is not None:
+            return cached
+
+        briefing = self._generate(prompt)
+        if briefing is not None and self.cache:
+            self.cache.store(fp, hashes, briefing, depth)
+        return briefing if briefing is not None else "Error generating briefing."
+
+    def stream_briefing(self, articles_content):
+        """
+        Streaming variant of synthesize_briefing: yields the briefing in chunks as the
+        model produces them. Cached briefings are yielded as a single chunk.
+        """
+        if not articles_content:
+            yield "No content to synthesize."
+            return
+
+        hashes, fp, cached, prompt, depth = self._prepare(articles_content)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        try:
+            with self._slots:
+                self.rate_limiter.acquire()
+                started = time.perf_counter()
+                for chunk in self.model.generate_content(prompt, stream=True):
+                    text = chunk.text
+                    if text:
+                        if not parts:
+                            METRICS.observe('api_first_chunk_seconds', time.perf_counter() - started, api='generation')
+                        parts.append(text)
+                        yield text
+                METRICS.observe('api_request_seconds', time.perf_counter() - started, api='generation')
+                METRICS.inc('api_calls', api='generation', result='ok')
+        except Exception as e:
+            logger.error(f"Error during streaming synthesis: {e}")
+            METRICS.inc('api_calls', api='generation', result='error')
+            yield "\n\nError generating briefing." if parts else "Error generating briefing."
+            return
+
+        if self.cache:
+            self.cache.store(fp, hashes, ''.join(parts), depth)
+
+    def _prepare(self, articles_content):
+        """
+        Returns (hashes, fingerprint, cached briefing or None, prompt or None, delta depth).
+        The prompt is a delta update when only a few sources were added or changed since a
+        cached briefing that is not itself too many updates away from a full generation.
+        """
+        hashes = content_hashes(articles_content)
+        fp = fingerprint(hashes)
+        if self.cache:
+            cached = self.cache.get(fp)
+            if cached is not None:
+                logger.info("Sources unchanged, reusing cached briefing.")
+                METRICS.inc('cache_lookups', cache='synthesis', result='hit')
+                return hashes, fp, cached, None, 0
+            if self.delta_max_changed:
+                similar = self.cache.find_similar(hashes, max_changed=self.delta_max_changed)
+                if similar:
+                    previous, changed, depth = similar
+                    logger.info(f"{len(changed)} sources changed, updating the previous briefing.")
+                    METRICS.inc('cache_lookups', cache='synthesis', result='delta')
+                    prompt = self._build_update_prompt(previous, {url: articles_content[url] for url in changed})
+                    return hashes, fp, None, prompt, depth + 1
+            METRICS.inc('cache_lookups', cache='synthesis', result='miss')
+        return hashes, fp, None, self._build_prompt(articles_content), 0
+
+    def _format_sources(self, articles_content):
+        # Prepare context
+        context, stats = self.prompt_builder.build_context(articles_content)
+        self.last_prompt_stats = stats
+        METRICS.inc('prompt_chars', stats['final_chars'])
+        METRICS.inc('prompt_duplicate_paragraphs', stats['duplicate_paragraphs'])
+        saved = 1 - stats['final_chars'] / stats['original_chars'] if stats['original_chars'] else 0.0
+        logger.info(f"Prompt context: {stats['original_chars']} -> {stats['final_chars']} chars "
+                    f"({saved:.0%} smaller, {stats['duplicate_paragraphs']} duplicate paragraphs removed, "
+                    f"~{stats['estimated_tokens']} tokens).")
+        return context
+
+    def _build_prompt(self, articles_content):
+        context = self._format_sources(articles_content)
+        return (
+            "You are an expert news analyst. "
+            "Synthesize these articles into a single coherent narrative briefing. "
+            "Highlight discrepancies between sources if any. "
+            "Focus on the facts and the bigger picture. "
+            "Format nicely in Markdown."
+            "\n\n"
+            f"{context}"
+        )
+
+    def _build_update_prompt(self, previous_briefing, changed_content):
+        """Prompt for a delta update: the previous briefing plus only the new or changed sources."""
+        context = self._format_sources(changed_content)
+        return (
+            "You are an expert news analyst. "
+            "Below is an existing briefing followed by new or updated source articles. "
+            "Update the briefing to incorporate them, keeping its structure and everything that still holds. "
+            "Highlight discrepancies between sources if any. "
+            "Format nicely in Markdown. Return only the updated briefing."
+            "\n\n"
+            f"--- EXISTING BRIEFING ---\n{previous_briefing}\n\n"
+            f"{context}"
+        )
+
+    def _generate(self, prompt):
+        """Runs one generation within the shared budget. Returns None on failure."""
+        try:
+            with self._slots:
+                self.rate_limiter.acquire()
+                with METRICS.timer('api_request', api='generation'):
+                    response = self.model.generate_content(prompt)
+            METRICS.inc('api_calls', api='generation', result='ok')
+            return response.text
+        except Exception as e:
+            logger.error(f"Error during synthesis: {e}")
+            METRICS.inc('api_calls', api='generation', result='error')
+            return None
+
+if __name__ == "__main__":
+    agent = SynthesisAgent()
+    # Mock data would go here
@@ -0,0 +1,98 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_FILE = os.path.join(".cache", "synthesis_cache.db")
+
+def content_hashes(articles_content):
+    """Returns {url: sha256 of the text} for a {url: text} map."""
+    return {url: hashlib.sha256(text.encode('utf-8')).hexdigest() for url, text in articles_content.items()}
+
+def fingerprint(hashes):
+    """Order-independent fingerprint of a cluster's sources: sorted URLs plus their content hashes."""
+    digest = hashlib.sha256()
+    for url in sorted(hashes):
+        digest.update(f"{url}\x00{hashes[url]}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+class SynthesisCache:
+    """
+    Persistent cache of generated briefings keyed on the fingerprint of their sources.
+    Besides exact lookups it can find the closest earlier briefing whose sources differ in
+    only a few URLs, so the synthesizer can ask for a cheaper delta update.
+    Every entry records its delta_depth (0 for a full generation, n for the nth delta update
+    in a row), deltas are only built on entries shallower than max_delta_depth so errors of
+    successive updates don't pile up.
+    """
+    max_delta_depth = 1
+
+    def __init__(self, path=DEFAULT_DB_FILE, max_entries=500):
+        self.path = path
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS briefings (
+                fingerprint TEXT PRIMARY KEY,
+                sources TEXT,
+                briefing TEXT,
+                created REAL
+            )
+        """)
+        # Added to caches created before delta depths were tracked
+        existing = {row[1] for row in self.conn.execute("PRAGMA table_info(briefings)")}
+        if 'delta_depth' not in existing:
+            self.conn.execute("ALTER TABLE briefings ADD COLUMN delta_depth INTEGER NOT NULL DEFAULT 0")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_briefings_created ON briefings(created)")
+        self.conn.commit()
+
+    def get(self, fp):
+        with self._lock:
+            row = self.conn.execute("SELECT briefing FROM briefings WHERE fingerprint = ?", (fp,)).fetchone()
+        return row[0] if row else None
+
+    def find_similar(self, hashes, max_changed=2, candidates=100):
+        """
+        Returns (briefing, changed_urls, delta_depth) for the most recent cached briefing that
+        shares sources with hashes and differs in at most max_changed of them, or None.
+        changed_urls are the URLs that are new or whose content changed. Briefings citing a
+        source that is no longer in hashes are skipped: an update prompt cannot take claims
+        back out, those clusters are regenerated in full.
+        """
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT sources, briefing, delta_depth FROM briefings WHERE delta_depth < ? "
+                "ORDER BY created DESC LIMIT ?", (self.max_delta_depth, candidates)).fetchall()
+        best = None
+        for sources_json, briefing, depth in rows:
+            previous = json.loads(sources_json)
+            if any(url not in hashes for url in previous):
+                continue
+            changed = [url for url, h in hashes.items() if previous.get(url) != h]
+            if not changed or len(changed) == len(hashes) or len(changed) > max_changed:
+                continue
+            if best is None or len(changed) < len(best[1]):
+                best = (briefing, changed, depth)
+        return best
+
+    def store(self, fp, hashes, briefing, delta_depth=0):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO briefings (fingerprint, sources, briefing, created, delta_depth) "
+                "VALUES (?, ?, ?, ?, ?)", (fp, json.dumps(hashes), briefing, time.time(), delta_depth))
+            self.conn.execute(
+                "DELETE FROM briefings WHERE fingerprint NOT IN "
+                "(SELECT fingerprint FROM briefings ORDER BY created DESC LIMIT ?)", (self.max_entries,))
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
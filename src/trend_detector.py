@@ -1,107 +1,212 @@
-import os
-import google.generativeai as genai
-import numpy as np
-from sklearn.cluster import DBSCAN
-from sklearn.metrics.pairwise import cosine_distances
-import logging
-from dotenv import load_dotenv
-
-load_dotenv()
-logger = logging.getLogger(__name__)
-
-class TrendDetector:
-    def __init__(self, api_key=None):
-        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
-            logger.warning("GEMINI_API_KEY not found. Embeddings will fail.")
-        else:
-            genai.configure(api_key=self.api_key)
-        
-        # DBSCAN parameters:
-        # eps is the maximum distance between two samples for one to be considered as in the neighborhood of the other.
-        # min_samples is the number of samples (or total weight) in a neighborhood for a point to be considered as a core point.
-        # Cosine distance ranges from 0 to 2. Tightly clustered might be < 0.2
-        self.eps = 0.25 
-        self.min_samples = 3 # Lowered slightly to capture smaller emerging trends, user asked for >5 for trigger but detection can be lower
-        
-    def vectorize_texts(self, texts):
-        """
-        Get embeddings for a list of texts using Gemini.
-        """
-        if not texts:
-            return []
-        
-        try:
-            # text-embedding-004 is a good model choice
-            result = genai.embed_content(
-                model="gemini-embedding-001",
-                content=texts,
-                task_type="clustering",
-            )
-            return result['embedding']
-        except Exception as e:
-            logger.error(f"Error generating embeddings: {e}")
-            return []
-
-    def detect_clusters(self, articles):
-        """
-        Takes a list of articles, vectorizes headlines, and clusters them.
-        Returns a list of clusters (each cluster is a list of articles).
-        """
-        if not articles:
-            return []
-            
-        headlines = []
-        for art in articles:
-            summary = art.get('summary', '')[:100]
-            headlines.append(f"{art['title']} {summary}")
-        vectors = self.vectorize_texts(headlines)
-        
-        if not vectors:
-            return []
-            
-        X = np.array(vectors)
-        
-        # Compute DBSCAN
-        # metric='cosine' expects distance, so eps is cosine distance threshold
-        db = DBSCAN(eps=self.eps, min_samples=self.min_samples, metric='cosine').fit(X)
-        labels = db.labels_
-        
-        clusters_map = {}
-        for idx, label in enumerate(labels):
-            if label == -1:
-                continue # Noise
-            
-            if label not in clusters_map:
-                clusters_map[label] = []
-            clusters_map[label].append(articles[idx])
-            
-        # Filter for user requirement: >5 vectors (or maybe >=5)
-        # The user said ">5 vectors cluster tightly". 
-        # I'll stick to returning all valid clusters for now, key filtering can happen in orchestrator.
-        return list(clusters_map.values())
-
-if __name__ == "__main__":
-    # Mock test
-    logging.basicConfig(level=logging.INFO)
-    detector = TrendDetector()
-    
-    mock_articles = [
-        {"title": "New iPhone 16 released with AI features", "source": "TechCrunch"},
-        {"title": "Apple announces iPhone 16 today", "source": "The Verge"},
-        {"title": "iPhone 16: Everything you need to know", "source": "Wired"},
-        {"title": "Apple Intelligence comes to iPhone 16", "source": "CNET"},
-        {"title": "Review of the new iPhone 16", "source": "NYT"},
-        {"title": "SpaceX launches Starship", "source": "BBC"}, # Outlier
-        {"title": "Local cat stuck in tree", "source": "Local"}, # Outlier
-    ]
-    
-    # Note: This will fail without API key
-    if detector.api_key:
-        clusters = detector.detect_clusters(mock_articles)
-        for i, cluster in enumerate(clusters):
-            print(f"Cluster {i}: {len(cluster)} articles")
-            for art in cluster:
-                print(f" - {art['title']}")
-    else:
-        print("Skipping run, no API Key.")
+import logging
+
+from src import clients
+from src.embedding_cache import EmbeddingCache
+from src.embedding_batcher import EmbeddingBatcher
+from src.incremental_clusterer import IncrementalClusterer
+from src.ann_index import IVFIndex
+from src.similarity import to_unit_matrix, radius_neighbors_graph
+from src.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+class TrendDetector:
+    def __init__(self, api_key=None, cache=None, use_cache=True, embedding_backend=None, batch_size=100, max_workers=4,
+                 mode='dbscan', neighbors='exact', requests_per_minute=150):
+        self.api_key = clients.api_key(api_key)
+        if not self.api_key and embedding_backend is None:
+            logger.warning("GEMINI_API_KEY not found. Embeddings will fail.")
+
+        # text-embedding-004 is a good model choice
+        self.embedding_model = "gemini-embedding-001"
+        self.task_type = "clustering"
+        # On-disk embedding cache, only texts missing from it are sent to the API
+        self.cache = cache if cache is not None else (EmbeddingCache() if use_cache else None)
+        # Chunked, rate-limited and retrying embedding requests. embedding_backend replaces
+        # the Gemini call (e.g. with src.fake_backends.FakeEmbeddingBackend for offline runs).
+        self.batcher = EmbeddingBatcher(embedding_backend or self._gemini_embed, batch_size=batch_size,
+                                        max_workers=max_workers, requests_per_minute=requests_per_minute)
+        
+        # DBSCAN parameters:
+        # eps is the maximum distance between two samples for one to be considered as in the neighborhood of the other.
+        # min_samples is the number of samples (or total weight) in a neighborhood for a point to be considered as a core point.
+        # Cosine distance ranges from 0 to 2. Tightly clustered might be < 0.2
+        self.eps = 0.25 
+        self.min_samples = 3 # Lowered slightly to capture smaller emerging trends, user asked for >5 for trigger but detection can be lower
+
+        # mode='dbscan' refits on the full window every run, mode='incremental' keeps
+        # cluster state (and stable cluster IDs) across runs, see update_clusters
+        self.mode = mode
+        self.clusterer = IncrementalClusterer(eps=self.eps) if mode == 'incremental' else None
+        # neighbors='exact' lets DBSCAN compare every pair, neighbors='ann' feeds it a
+        # neighbourhood graph from an approximate IVF index (for very large windows)
+        self.neighbors = neighbors
+        
+    def vectorize_texts(self, texts):
+        """
+        Get embeddings for a list of texts using Gemini.
+        Texts already embedded in earlier runs are served from the embedding cache.
+        Returns a list aligned with texts, entries that could not be embedded are None.
+        """
+        if not texts:
+            return []
+
+        if self.cache is None:
+            return self._embed(texts)
+
+        keys = [self.cache.key(text, self.embedding_model, self.task_type) for text in texts]
+        vectors = self.cache.get_many(keys)
+
+        # Embed each distinct uncached text once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        logger.info(f"Embedding cache: {len(vectors)} hits, embedding {len(missing)} new texts.")
+        METRICS.inc('cache_lookups', len(vectors), cache='embedding', result='hit')
+        METRICS.inc('cache_lookups', len(missing), cache='embedding', result='miss')
+
+        if missing:
+            fresh = dict(zip(missing.keys(), self._embed(list(missing.values()))))
+            self.cache.put_many({key: v for key, v in fresh.items() if v is not None})
+            vectors.update(fresh)
+
+        return [vectors[key] for key in keys]
+
+    def _embed(self, texts):
+        """Embeds texts in batches. Failed entries are None."""
+        return self.batcher.embed(texts)
+
+    def _gemini_embed(self, texts):
+        """Single embed_content request, raises on failure so the batcher can retry."""
+        result = clients.genai(self.api_key).embed_content(
+            model=self.embedding_model,
+            content=texts,
+            task_type=self.task_type,
+        )
+        return result['embedding']
+
+    @staticmethod
+    def headline(article):
+        """Text embedded for an article: its title and the start of its summary."""
+        return f"{article['title']} {article.get('summary', '')[:100]}"
+
+    def detect_clusters(self, articles):
+        """
+        Takes a list of articles, vectorizes headlines, and clusters them.
+        Returns a list of clusters (each cluster is a list of articles).
+        """
+        if not articles:
+            return []
+            
+        headlines = [self.headline(art) for art in articles]
+        vectors = self.vectorize_texts(headlines)
+
+        # Articles whose embedding failed are left out instead of failing the whole run
+        embedded = [idx for idx, v in enumerate(vectors) if v is not None]
+        if len(embedded) < len(articles):
+            logger.warning(f"Skipping {len(articles) - len(embedded)} articles without embeddings.")
+        if not embedded:
+            return []
+        articles = [articles[idx] for idx in embedded]
+            
+        X = to_unit_matrix([vectors[idx] for idx in embedded])
+        
+        labels = self.cluster_labels(X)
+        
+        clusters_map = {}
+        for idx, label in enumerate(labels):
+            if label == -1:
+                continue # Noise
+            
+            if label not in clusters_map:
+                clusters_map[label] = []
+            clusters_map[label].append(articles[idx])
+            
+        # Filter for user requirement: >5 vectors (or maybe >=5)
+        # The user said ">5 vectors cluster tightly". 
+        # I'll stick to returning all valid clusters for now, key filtering can happen in orchestrator.
+        return list(clusters_map.values())
+
+    def cluster_labels(self, X):
+        """
+        DBSCAN labels (-1 for noise) for a unit-normalized embedding matrix (see to_unit_matrix).
+        The eps-neighbourhood graph is built with blocked matrix products (exact) or an IVF
+        index (ann), and DBSCAN runs on that sparse graph instead of recomputing distances.
+        """
+        with METRICS.timer('neighbor_graph', neighbors=self.neighbors):
+            if self.neighbors == 'ann':
+                graph = IVFIndex().fit(X).radius_neighbors_graph(self.eps)
+            else:
+                graph = radius_neighbors_graph(X, self.eps)
+
+        # Compute DBSCAN
+        # eps is the cosine distance threshold, the graph holds cosine distances
+        # scikit-learn takes about a second to import, so only runs that cluster load it
+        from sklearn.cluster import DBSCAN
+        with METRICS.timer('dbscan'):
+            db = DBSCAN(eps=self.eps, min_samples=self.min_samples, metric='precomputed').fit(graph)
+        return db.labels_
+
+    def update_clusters(self, articles, cutoff_time):
+        """
+        Incremental mode: embeds only articles the clusterer has not seen, assigns them to
+        the persistent clusters and expires articles older than cutoff_time.
+        Returns clusters (dicts with 'id', 'articles', 'size', 'previous_size'), largest first.
+        """
+        unseen = self.add_articles(articles)
+        clusters = self.finalize_clusters(cutoff_time)
+        logger.info(f"Incremental clustering: {unseen} new articles, {len(clusters)} clusters.")
+        return clusters
+
+    def add_articles(self, articles):
+        """
+        Incremental mode: embeds the articles the clusterer has not seen and assigns them.
+        Can be called repeatedly as articles stream in. Returns the number of new articles.
+        """
+        if self.clusterer is None:
+            raise ValueError("Incremental clustering requires mode='incremental'")
+
+        unseen = [art for art in articles if art not in self.clusterer]
+        if unseen:
+            headlines = [self.headline(art) for art in unseen]
+            vectors = self.vectorize_texts(headlines)
+            embedded = [idx for idx, v in enumerate(vectors) if v is not None]
+            if len(embedded) < len(unseen):
+                logger.warning(f"Skipping {len(unseen) - len(embedded)} articles without embeddings.")
+            if embedded:
+                with METRICS.timer('incremental_assign'):
+                    self.clusterer.add([unseen[idx] for idx in embedded], [vectors[idx] for idx in embedded])
+        return len(unseen)
+
+    def finalize_clusters(self, cutoff_time):
+        """Incremental mode: expires old articles, persists the state and returns the current clusters."""
+        self.clusterer.expire(cutoff_time)
+        clusters = self.clusterer.current_clusters(min_size=self.min_samples)
+        self.clusterer.save()
+        return clusters
+
+if __name__ == "__main__":
+    # Mock test
+    logging.basicConfig(level=logging.INFO)
+    detector = TrendDetector()
+    
+    mock_articles = [
+        {"title": "New iPhone 16 released with AI features", "source": "TechCrunch"},
+        {"title": "Apple announces iPhone 16 today", "source": "The Verge"},
+        {"title": "iPhone 16: Everything you need to know", "source": "Wired"},
+        {"title": "Apple Intelligence comes to iPhone 16", "source": "CNET"},
+        {"title": "Review of the new iPhone 16", "source": "NYT"},
+        {"title": "SpaceX launches Starship", "source": "BBC"}, # Outlier
+        {"title": "Local cat stuck in tree", "source": "Local"}, # Outlier
+    ]
+    
+    # Note: This will fail without API key
+    if detector.api_key:
+        clusters = detector.detect_clusters(mock_articles)
+        for i, cluster in enumerate(clusters):
+            print(f"Cluster {i}: {len(cluster)} articles")
+            for art in cluster:
+                print(f" - {art['title']}")
+    else:
+        print("Skipping run, no API Key.")